@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+from datetime import datetime
+import cv2
+import numpy as np
+from face_detection import detect_faces
+from frame_sources import ReplaySource, IMAGE_EXTENSIONS
+from reference_store import load_skin_tone_classifier
+from skin_tone_classifier import get_average_face_rgb
+from tone_lookup import ToneLookupTable
+from wled_dispatch import WledDispatcher, start_stand_in
+
+# Same corpus model_training.py extracts from: dataset/monk_*/<subject>/<image>
+DATASET_DIR = "dataset"
+CSV_PATH = "monk_skin_tones.csv"
+RESULTS_DIR = "benchmarks"
+DISPATCH_ROUNDS = 50
+
+def corpus_files(dataset_dir):
+    """Every image under the dataset tree, in a fixed order so runs are comparable."""
+    files = []
+    for root, dirs, names in os.walk(dataset_dir):
+        dirs.sort()
+        files.extend(os.path.join(root, name) for name in sorted(names)
+                     if name.lower().endswith(IMAGE_EXTENSIONS))
+    return files
+
+def corpus_frames(path, limit):
+    """(decode_seconds, frame) for up to `limit` frames of a dataset tree or replay source."""
+    if os.path.isdir(path) and not any(name.lower().endswith(IMAGE_EXTENSIONS) for name in os.listdir(path)):
+        for image_path in corpus_files(path)[:limit]:
+            start = time.perf_counter()
+            frame = cv2.imread(image_path)
+            yield time.perf_counter() - start, frame
+        return
+
+    source = ReplaySource(path)
+    for _ in range(limit):
+        start = time.perf_counter()
+        frame = source.read()
+        if frame is None:
+            break
+        yield time.perf_counter() - start, frame
+    source.close()
+
+def summarize(samples):
+    if not samples:
+        return {"count": 0}
+    ms = np.array(samples) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+def timed(timings, stage, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    timings.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+def benchmark_frames(path, limit, warmup, classifier, lookup):
+    """Per-stage and whole-pipeline latency over the corpus."""
+    timings = {}
+    frames = faces = 0
+    pipeline_seconds = 0.0
+
+    for index, (decode_seconds, frame) in enumerate(corpus_frames(path, limit + warmup)):
+        if frame is None:
+            continue
+        frame_timings = {"decode": [decode_seconds]}
+        face_locations = timed(frame_timings, "face_locations", detect_faces, frame)
+        for face_location in face_locations:
+            avg_rgb = timed(frame_timings, "get_average_face_rgb", get_average_face_rgb, frame, face_location)
+            timed(frame_timings, "classify_exact", classifier.classify, avg_rgb)
+            timed(frame_timings, "classify_lookup", lookup.classify, avg_rgb)
+
+        if index < warmup:
+            continue
+        # The live pipeline uses the lookup table, not the exact classifier
+        frame_seconds = sum(sum(values) for stage, values in frame_timings.items() if stage != "classify_exact")
+        frame_timings["pipeline"] = [frame_seconds]
+        pipeline_seconds += frame_seconds
+        frames += 1
+        faces += len(face_locations)
+        for stage, values in frame_timings.items():
+            timings.setdefault(stage, []).extend(values)
+
+    return timings, frames, faces, pipeline_seconds
+
+def benchmark_dispatch(rounds, devices=2):
+    """send_preset call latency and per-device delivery latency against local stand-in lightboxes."""
+    servers = [start_stand_in(0) for _ in range(devices)]
+    delivered = []
+    dispatcher = WledDispatcher([f"127.0.0.1:{server.server_address[1]}" for server in servers],
+                                on_result=lambda result: delivered.append(result.elapsed), resync_interval=None)
+    calls = []
+    for index in range(rounds):
+        preset_id = 1 + index % 5  # alternate presets so none are skipped as no-ops
+        start = time.perf_counter()
+        dispatcher.send_preset(preset_id)
+        calls.append(time.perf_counter() - start)
+        dispatcher.wait_idle()
+    dispatcher.close()
+    for server in servers:
+        server.shutdown()
+    return {"send_preset": calls, "wled_delivery": delivered}
+
+def compare(current, baseline_path):
+    with open(baseline_path, "r") as file:
+        baseline = json.load(file)
+    print(f"\nCompared with {baseline_path}:")
+    for stage, stats in current["stages"].items():
+        before = baseline["stages"].get(stage)
+        if not before or not before.get("count") or not stats.get("count"):
+            continue
+        changes = [f"{key[:-3]} {stats[key]:.3f} ms ({(stats[key] / before[key] - 1) * 100:+.1f}%)"
+                   for key in ("p50_ms", "p95_ms", "p99_ms") if before[key]]
+        print(f"  {stage:22s} " + ", ".join(changes))
+    if baseline.get("fps"):
+        print(f"  {'fps':22s} {current['fps']:.2f} ({(current['fps'] / baseline['fps'] - 1) * 100:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the skin-tone pipeline over a fixed image corpus.")
+    parser.add_argument("source", nargs="?", default=DATASET_DIR,
+                        help="dataset tree, JPEG folder, video file or .npy frame dump")
+    parser.add_argument("--csv", default=CSV_PATH, help="Monk reference CSV")
+    parser.add_argument("--limit", type=int, default=500, help="frames to measure")
+    parser.add_argument("--warmup", type=int, default=3, help="frames run before measuring")
+    parser.add_argument("--dispatch-rounds", type=int, default=DISPATCH_ROUNDS)
+    parser.add_argument("--output", help="results JSON (default: benchmarks/benchmark_<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    classifier = load_skin_tone_classifier(args.csv)
+    lookup = ToneLookupTable.load_or_build(args.csv, classifier=classifier)
+    startup_seconds = time.perf_counter() - start
+
+    timings, frames, faces, pipeline_seconds = benchmark_frames(
+        args.source, args.limit, args.warmup, classifier, lookup)
+    if args.dispatch_rounds:
+        timings.update(benchmark_dispatch(args.dispatch_rounds))
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "source": args.source,
+            "csv": args.csv,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+        },
+        "frames": frames,
+        "faces": faces,
+        "fps": frames / pipeline_seconds if pipeline_seconds else 0.0,
+        "startup_ms": round(startup_seconds * 1000, 2),
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": {stage: summarize(samples) for stage, samples in timings.items()},
+    }
+
+    print(f"{frames} frames, {faces} faces, {results['fps']:.2f} FPS, peak RSS {results['peak_rss_mb']} MB")
+    for stage, stats in results["stages"].items():
+        if stats["count"]:
+            print(f"  {stage:22s} n={stats['count']:5d}  p50 {stats['p50_ms']:9.3f} ms  "
+                  f"p95 {stats['p95_ms']:9.3f} ms  p99 {stats['p99_ms']:9.3f} ms")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import struct
+import pickle
+import numpy as np
+
+# Bump when the layout of the .npy store or its sidecar changes
+STORE_VERSION = 1
+
+ENCODINGS_STORE = "encodings.npy"
+LEGACY_PICKLE = "encodings.pickle"
+ENCODING_DIM = 128
+
+# The store is an (N, 128) float32 .npy matrix with one known face per row, plus a
+# JSON sidecar holding the name of every row. Its .npy header is padded to a
+# fixed HEADER_BYTES, so enrolling a face appends rows and rewrites the row
+# count in place instead of rewriting the whole matrix.
+HEADER_BYTES = 128
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+def sidecar_path(store_path):
+    return os.path.splitext(store_path)[0] + ".json"
+
+def _npy_header(rows, dim):
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (rows, dim)
+    # Magic + version (8 bytes) and the header length (2 bytes) come first
+    header = header.ljust(HEADER_BYTES - len(NPY_MAGIC) - 2 - 1) + "\n"
+    return NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1")
+
+def _as_rows(encodings, dim):
+    rows = np.asarray(encodings, dtype="<f4").reshape(-1, dim)
+    if not np.isfinite(rows).all():
+        raise ValueError("Encodings contain NaN or infinite values")
+    return rows
+
+def _write_sidecar(store_path, names, dim, source=None):
+    metadata = {"version": STORE_VERSION, "dim": dim, "rows": len(names), "names": list(names)}
+    if source:
+        metadata["source"] = source
+    path = sidecar_path(store_path)
+    with open(path + ".tmp", "w") as file:
+        json.dump(metadata, file)
+    os.replace(path + ".tmp", path)
+
+def _read_sidecar(store_path):
+    with open(sidecar_path(store_path), "r") as file:
+        metadata = json.load(file)
+    if metadata.get("version") != STORE_VERSION:
+        raise ValueError(f"Unsupported encoding store version {metadata.get('version')}")
+    return metadata
+
+def create_encoding_store(store_path, encodings, names, dim=ENCODING_DIM, source=None):
+    """Write a new store holding `encodings` (one row per entry of `names`)."""
+    rows = _as_rows(encodings, dim)
+    if len(rows) != len(names):
+        raise ValueError(f"{len(rows)} encodings but {len(names)} names")
+    with open(store_path + ".tmp", "wb") as file:
+        file.write(_npy_header(len(rows), dim))
+        file.write(rows.tobytes())
+    os.replace(store_path + ".tmp", store_path)
+    # Sidecar last: rows it does not name are never used
+    _write_sidecar(store_path, names, dim, source)
+    print(f"[INFO] Encoding store saved to {store_path} ({len(names)} encodings)")
+
+def append_encodings(store_path, encodings, names):
+    """Enroll more faces: append their rows and update the row count, leaving existing rows untouched."""
+    metadata = _read_sidecar(store_path)
+    dim = metadata["dim"]
+    rows = _as_rows(encodings, dim)
+    if len(rows) != len(names):
+        raise ValueError(f"{len(rows)} encodings but {len(names)} names")
+    known = metadata["names"]
+    total = len(known) + len(rows)
+
+    with open(store_path, "r+b") as file:
+        # Drop rows past the sidecar's count left by an interrupted append
+        file.truncate(HEADER_BYTES + len(known) * dim * 4)
+        file.seek(0, os.SEEK_END)
+        file.write(rows.tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+        file.seek(0)
+        file.write(_npy_header(total, dim))
+    _write_sidecar(store_path, known + list(names), dim, metadata.get("source"))
+    print(f"[INFO] Enrolled {len(names)} encodings into {store_path} ({total} total)")
+
+def convert_pickle(pickle_path=LEGACY_PICKLE, store_path=ENCODINGS_STORE):
+    """One-time conversion of the {"encodings": [...], "names": [...]} pickle into a store."""
+    with open(pickle_path, "rb") as file:
+        data = pickle.loads(file.read())
+    encodings = np.array(data["encodings"])
+    create_encoding_store(store_path, encodings, data["names"], dim=encodings.shape[1],
+                          source=os.path.basename(pickle_path))
+
+def load_encoding_store(store_path=ENCODINGS_STORE, legacy_pickle=LEGACY_PICKLE):
+    """(encodings, names) with the encodings memory-mapped read-only.
+
+    If the store does not exist yet but the legacy pickle does, the pickle is
+    converted first.
+    """
+    if not os.path.exists(store_path) and legacy_pickle and os.path.exists(legacy_pickle):
+        print(f"[INFO] No encoding store at {store_path}, converting {legacy_pickle}")
+        convert_pickle(legacy_pickle, store_path)
+
+    metadata = _read_sidecar(store_path)
+    names = metadata["names"]
+    matrix = np.load(store_path, mmap_mode="r")
+    if matrix.dtype != np.float32 or matrix.ndim != 2 or matrix.shape[1] != metadata["dim"]:
+        raise ValueError(f"{store_path} does not match its sidecar")
+    if matrix.shape[0] < len(names):
+        raise ValueError(f"{store_path} has {matrix.shape[0]} rows but its sidecar names {len(names)}")
+    # Rows beyond the sidecar come from an append that did not finish
+    return matrix[:len(names)], names
+
+def encode_images(image_paths):
+    """One 128-d encoding per image that contains exactly one face."""
+    import face_recognition
+
+    encodings = []
+    for image_path in image_paths:
+        image = face_recognition.load_image_file(image_path)
+        boxes = face_recognition.face_locations(image, model="hog")
+        if len(boxes) != 1:
+            print(f"[WARN] Skipping {image_path}: found {len(boxes)} faces")
+            continue
+        encodings.append(face_recognition.face_encodings(image, boxes, model="large")[0])
+    return encodings
+
+if __name__ == "__main__":
+    usage = ("usage: python encoding_store.py convert [encodings.pickle] [encodings.npy]\n"
+             "       python encoding_store.py enroll NAME IMAGE [IMAGE ...]")
+    if len(sys.argv) >= 2 and sys.argv[1] == "convert":
+        convert_pickle(*sys.argv[2:4])
+    elif len(sys.argv) >= 4 and sys.argv[1] == "enroll":
+        name, images = sys.argv[2], sys.argv[3:]
+        encodings = encode_images(images)
+        if not encodings:
+            sys.exit("No usable faces found")
+        if os.path.exists(ENCODINGS_STORE) or os.path.exists(LEGACY_PICKLE):
+            load_encoding_store()  # Converts the legacy pickle on first use
+            append_encodings(ENCODINGS_STORE, encodings, [name] * len(encodings))
+        else:
+            create_encoding_store(ENCODINGS_STORE, encodings, [name] * len(encodings))
+    else:
+        sys.exit(usage)
@@ -0,0 +1,92 @@
+import cv2
+import face_recognition
+from frame_sources import crop_frame, luma_scale
+from stage_metrics import NO_METRICS
+
+# Detection runs on a downscaled copy of the frame; boxes are mapped back to full size
+DETECTION_SCALE = 0.5
+
+def detection_image(frame, scale=DETECTION_SCALE, metrics=NO_METRICS):
+    """(image, scale_y, scale_x): what HOG runs on for `frame` and its size relative to the frame.
+
+    Frames carrying a camera luma plane are searched on that plane directly
+    (its resolution replaces `scale`); others on a resized copy.
+    """
+    if getattr(frame, "luma", None) is not None:
+        return (frame.luma,) + luma_scale(frame)
+    with metrics.time("resize"):
+        return cv2.resize(frame, (0, 0), fx=scale, fy=scale), scale, scale
+
+def scale_boxes(boxes, scale_y, scale_x):
+    """Map (top, right, bottom, left) boxes from the detection image back to the full frame."""
+    return [(int(top / scale_y), int(right / scale_x), int(bottom / scale_y), int(left / scale_x))
+            for (top, right, bottom, left) in boxes]
+
+def detect_faces(frame, scale=DETECTION_SCALE, metrics=NO_METRICS):
+    """HOG face boxes as (top, right, bottom, left) in full-frame coordinates."""
+    image, scale_y, scale_x = detection_image(frame, scale, metrics)
+    with metrics.time("detection"):
+        small_locations = face_recognition.face_locations(image, model="hog")
+    return scale_boxes(small_locations, scale_y, scale_x)
+
+# Search area around the last face box, as a fraction of the box size on each side
+ROI_MARGIN = 0.75
+
+# Even while the ROI keeps hitting, scan the whole frame every N detections so
+# a second person stepping in is not missed
+FULL_SEARCH_EVERY = 30
+
+class RoiFaceDetector:
+    """Detects faces inside an expanded crop around the last known faces first.
+
+    Falls back to a full-frame search when the crop finds nothing. Returned
+    boxes are always in full-frame coordinates. `detect_fn` is called like
+    detect_faces (the default) and may run the search elsewhere, e.g. in a
+    process pool.
+    """
+
+    def __init__(self, scale=DETECTION_SCALE, margin=ROI_MARGIN, full_search_every=FULL_SEARCH_EVERY,
+                 metrics=NO_METRICS, detect_fn=detect_faces):
+        self.detect_fn = detect_fn
+        self.scale = scale
+        self.margin = margin
+        self.full_search_every = full_search_every
+        self.metrics = metrics
+        self.last_boxes = []
+        self.since_full_search = 0
+        self.stats = {"roi_hits": 0, "full_searches": 0}
+
+    def reset(self):
+        self.last_boxes = []
+
+    def _search_area(self, frame):
+        """Crop bounds (y0, y1, x0, x1) covering the last boxes plus the margin."""
+        top = min(box[0] for box in self.last_boxes)
+        right = max(box[1] for box in self.last_boxes)
+        bottom = max(box[2] for box in self.last_boxes)
+        left = min(box[3] for box in self.last_boxes)
+        margin_y = int((bottom - top) * self.margin)
+        margin_x = int((right - left) * self.margin)
+        return (max(0, top - margin_y), min(frame.shape[0], bottom + margin_y),
+                max(0, left - margin_x), min(frame.shape[1], right + margin_x))
+
+    def __call__(self, frame):
+        if self.last_boxes and self.since_full_search < self.full_search_every:
+            y0, y1, x0, x1 = self._search_area(frame)
+            boxes = [(top + y0, right + x0, bottom + y0, left + x0)
+                     for (top, right, bottom, left) in self.detect_fn(crop_frame(frame, y0, y1, x0, x1), self.scale, self.metrics)]
+            if boxes:
+                self.stats["roi_hits"] += 1
+                self.since_full_search += 1
+                self.last_boxes = boxes
+                return boxes
+
+        boxes = self.detect_fn(frame, self.scale, self.metrics)
+        self.stats["full_searches"] += 1
+        self.since_full_search = 0
+        self.last_boxes = boxes
+        return boxes
+
+    def format_stats(self):
+        return (f"[ROI] {self.stats['roi_hits']} ROI hits, "
+                f"{self.stats['full_searches']} full-frame searches")
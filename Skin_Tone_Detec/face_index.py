@@ -0,0 +1,76 @@
+import pickle
+import numpy as np
+from encoding_store import ENCODING_DIM, ENCODINGS_STORE, load_encoding_store
+
+# Same default as face_recognition.compare_faces: a match needs distance <= TOLERANCE
+TOLERANCE = 0.6
+UNKNOWN = "Unknown"
+
+class FaceIndex:
+    """Known face encodings as one contiguous float32 matrix with a name id per row.
+
+    Every face in a frame is matched with a single batched distance
+    computation instead of compare_faces + face_distance per face. Distances
+    are the same Euclidean distances face_recognition.face_distance returns.
+    """
+
+    def __init__(self, encodings, names, dim=ENCODING_DIM):
+        # Explicit width so an empty store (nobody enrolled yet) still gives a (0, dim) matrix
+        self.encodings = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(len(names), dim))
+        self.names = sorted(set(names))
+        ids = {name: index for index, name in enumerate(self.names)}
+        self.name_ids = np.array([ids[name] for name in names], dtype=np.int32)
+        self.squared_norms = np.einsum("ij,ij->i", self.encodings, self.encodings)
+
+    @classmethod
+    def from_store(cls, store_path=None):
+        """Index the memory-mapped encoding store, converting encodings.pickle on first use."""
+        encodings, names = load_encoding_store(store_path or ENCODINGS_STORE)
+        return cls(encodings, names, dim=encodings.shape[1])
+
+    @classmethod
+    def from_pickle(cls, path):
+        """Index the {"encodings": [...], "names": [...]} pickle written by model training."""
+        with open(path, "rb") as file:
+            data = pickle.loads(file.read())
+        return cls(data["encodings"], data["names"])
+
+    def __len__(self):
+        return len(self.name_ids)
+
+    def name(self, row):
+        return self.names[self.name_ids[row]]
+
+    def distances(self, face_encodings):
+        """(faces, known) distance matrix for a batch of encodings."""
+        faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.encodings.shape[1])
+        # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, one matrix product for the whole batch
+        squared = (np.einsum("ij,ij->i", faces, faces)[:, None] + self.squared_norms[None, :]
+                   - 2.0 * faces @ self.encodings.T)
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def match(self, face_encodings, tolerance=TOLERANCE):
+        """(name, distance) of the nearest known face for each encoding; UNKNOWN beyond `tolerance`."""
+        if not len(face_encodings):
+            return []
+        if not len(self):
+            return [(UNKNOWN, np.inf) for _ in face_encodings]
+        rows = np.argmin(self.distances(face_encodings), axis=1)
+        # Exact float64 distance for the winner so the tolerance check matches compare_faces
+        best = np.linalg.norm(self.encodings[rows].astype(np.float64) - np.asarray(face_encodings, dtype=np.float64),
+                              axis=1)
+        return [(self.name(row) if distance <= tolerance else UNKNOWN, float(distance))
+                for row, distance in zip(rows, best)]
+
+    def top_k(self, face_encodings, k=3):
+        """For each encoding, the `k` nearest known faces as [(name, distance), ...] nearest first."""
+        if not len(face_encodings) or not len(self):
+            return [[] for _ in face_encodings]
+        distances = self.distances(face_encodings)
+        k = min(k, len(self))
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        results = []
+        for face, rows in enumerate(nearest):
+            rows = rows[np.argsort(distances[face, rows])]
+            results.append([(self.name(row), float(distances[face, row])) for row in rows])
+        return results
@@ -1,20 +1,24 @@
-import face_recognition
 import cv2
-import numpy as np
-import csv
 import time
-from picamera2 import Picamera2
-from libcamera import controls
 import paho.mqtt.client as mqtt
 from collections import Counter
+from tone_lookup import ToneLookupTable
+from skin_tone_classifier import get_average_face_rgb
+from face_detection import detect_faces
+from face_tracking import FaceTracker
+from frame_sources import open_frame_source
 
 # Configurations
 TUNING_FILE = "/home/chroma/Arducam-477P-Pi4.json"
 CSV_PATH = "/home/chroma/Desktop/Face Recognition/monk_skin_tones.csv"
+REPLAY_PATH = None  # JPEG folder, video file or .npy frame dump to use instead of the camera
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 MQTT_TOPIC = "wled/main/api"
 SAMPLE_COUNT = 7
+DETECT_EVERY = 5  # Full HOG detection every N frames, faces are tracked in between
+TRACKER_TYPE = "template"  # or an OpenCV tracker such as "MOSSE" / "KCF"
+LORES_SIZE = (640, 480)  # Camera YUV420 stream whose Y plane HOG runs on (None: resize the colour frame)
 
 bucket_mapping = {
     "monk_1": "Bucket1", "monk_2": "Bucket1",
@@ -24,49 +28,11 @@ bucket_mapping = {
     "monk_9": "Bucket5", "monk_10": "Bucket5",
 }
 
-def load_monk_skin_tones(csv_path):
-    skin_tones = {}
-    with open(csv_path, "r") as file:
-        reader = csv.reader(file)
-        next(reader)
-        for row in reader:
-            tone = row[0]
-            rgb = (int(row[1]), int(row[2]), int(row[3]))
-            skin_tones.setdefault(tone, []).append(rgb)
-    return skin_tones
-
-def classify_skin_tone(face_rgb, reference_rgb):
-    min_distance = float("inf")
-    closest_tone = None
-    for tone, samples in reference_rgb.items():
-        for ref_rgb in samples:
-            dist = np.linalg.norm(np.array(face_rgb) - np.array(ref_rgb))
-            if dist < min_distance:
-                min_distance = dist
-                closest_tone = tone
-    return closest_tone
-
-def initialize_camera():
-    picam2 = Picamera2(tuning=TUNING_FILE)
-    config = picam2.create_preview_configuration(main={"size": (1280, 960)})
-    picam2.configure(config)
-    picam2.start()
-    return picam2
-
-def get_average_face_rgb(frame, face_location):
-    (top, right, bottom, left) = face_location
-    face_roi = frame[top:bottom, left:right]
-    h, w, _ = face_roi.shape
-    forehead_roi = face_roi[:int(h * 0.4), :]
-    avg_r = int(np.mean(forehead_roi[:, :, 0]))
-    avg_g = int(np.mean(forehead_roi[:, :, 1]))
-    avg_b = int(np.mean(forehead_roi[:, :, 2]))
-    return (avg_r, avg_g, avg_b)
-
 mqtt_client = mqtt.Client()
 mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
-MONK_SKIN_TONES = load_monk_skin_tones(CSV_PATH)
-picam2 = initialize_camera()
+SKIN_TONE_LOOKUP = ToneLookupTable.load_or_build(CSV_PATH)
+frame_source = open_frame_source(REPLAY_PATH, tuning_file=TUNING_FILE, lores=LORES_SIZE)
+face_tracker = FaceTracker(detect_faces, detect_every=DETECT_EVERY, tracker_type=TRACKER_TYPE)
 
 classification_buffer = []
 sampling_active = True
@@ -75,11 +41,10 @@ last_detected_tone = "monk_?"
 print("Press 'R' to reset. Press 'Q' to quit.")
 
 while True:
-    frame = picam2.capture_array()
-    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-    small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-    small_locations = face_recognition.face_locations(small_frame, model="hog")
-    face_locations = [(top*2, right*2, bottom*2, left*2) for (top, right, bottom, left) in small_locations]
+    frame = frame_source.read()
+    if frame is None:
+        break
+    face_locations = face_tracker.locate(frame)
 
     for face_location in face_locations:
         (top, right, bottom, left) = face_location
@@ -87,7 +52,7 @@ while True:
 
         if sampling_active:
             avg_rgb = get_average_face_rgb(frame, face_location)
-            tone = classify_skin_tone(avg_rgb, MONK_SKIN_TONES)
+            tone = SKIN_TONE_LOOKUP.classify(avg_rgb)
             classification_buffer.append(tone)
             last_detected_tone = tone
             print(f"Sample {len(classification_buffer)}: {avg_rgb} -> {tone}")
@@ -112,7 +77,9 @@ while True:
     elif key == ord("r"):
         classification_buffer.clear()
         sampling_active = True
+        face_tracker.reset()
         print("Sampling reset.")
 
+print(face_tracker.format_stats())
 cv2.destroyAllWindows()
-picam2.stop()
+frame_source.close()
@@ -0,0 +1,132 @@
+import cv2
+from stage_metrics import NO_METRICS
+
+# Run the full detector every N frames and track faces in between
+DETECT_EVERY = 5
+
+# Template-match score below which a tracked face counts as lost
+MIN_TRACK_CONFIDENCE = 0.6
+
+# How far around the previous box (as a fraction of its size) to search
+SEARCH_MARGIN = 0.5
+
+def _gray(image):
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+class TemplateTracker:
+    """Follows a face by matching its detection-time appearance near the last box."""
+
+    def __init__(self, frame, box, search_margin=SEARCH_MARGIN):
+        (top, right, bottom, left) = box
+        self.template = _gray(frame[top:bottom, left:right])
+        self.box = box
+        self.search_margin = search_margin
+
+    def update(self, frame):
+        (top, right, bottom, left) = self.box
+        h, w = bottom - top, right - left
+        margin_y, margin_x = int(h * self.search_margin), int(w * self.search_margin)
+        y0, x0 = max(0, top - margin_y), max(0, left - margin_x)
+        y1, x1 = min(frame.shape[0], bottom + margin_y), min(frame.shape[1], right + margin_x)
+
+        window = _gray(frame[y0:y1, x0:x1])
+        if self.template.size == 0 or window.shape[0] < h or window.shape[1] < w:
+            return False, self.box, 0.0
+
+        result = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(result)
+        self.box = (y0 + dy, x0 + dx + w, y0 + dy + h, x0 + dx)
+        return True, self.box, score
+
+class OpenCVTracker:
+    """Wraps one of OpenCV's built-in trackers (MOSSE, KCF, CSRT...)."""
+
+    def __init__(self, frame, box, kind):
+        (top, right, bottom, left) = box
+        self.tracker = opencv_tracker_factory(kind)()
+        self.tracker.init(frame, (left, top, right - left, bottom - top))
+        self.box = box
+
+    def update(self, frame):
+        ok, (x, y, w, h) = self.tracker.update(frame)
+        if ok:
+            # KCF/MOSSE can report boxes partly outside the frame near its edges
+            height, width = frame.shape[:2]
+            top, bottom = max(0, int(y)), min(height, int(y + h))
+            left, right = max(0, int(x)), min(width, int(x + w))
+            if bottom <= top or right <= left:
+                ok = False  # Nothing of the face left in frame: force a full detection
+            else:
+                self.box = (top, right, bottom, left)
+        # OpenCV trackers only report success, not a score
+        return ok, self.box, 1.0 if ok else 0.0
+
+def opencv_tracker_factory(kind):
+    """Tracker constructor for `kind`, or None if this OpenCV build lacks it."""
+    for module in (getattr(cv2, "legacy", None), cv2):
+        factory = getattr(module, f"Tracker{kind}_create", None) if module else None
+        if factory:
+            return factory
+    return None
+
+class FaceTracker:
+    """Runs `detect_fn` every `detect_every` frames and tracks the faces in between.
+
+    A full detection is also forced whenever any tracked face is lost or its
+    confidence drops below `min_confidence`.
+    """
+
+    def __init__(self, detect_fn, detect_every=DETECT_EVERY, tracker_type="template",
+                 min_confidence=MIN_TRACK_CONFIDENCE, metrics=NO_METRICS):
+        self.detect_fn = detect_fn
+        self.metrics = metrics
+        self.detect_every = max(1, detect_every)
+        self.min_confidence = min_confidence
+        self.tracker_type = tracker_type
+        if tracker_type != "template" and opencv_tracker_factory(tracker_type) is None:
+            print(f"[TRACK] OpenCV tracker {tracker_type} not available, using template matching.")
+            self.tracker_type = "template"
+
+        self.trackers = []
+        self.frames_since_detect = 0
+        self.stats = {"frames": 0, "detected": 0, "tracked": 0, "lost": 0}
+
+    def _new_tracker(self, frame, box):
+        if self.tracker_type == "template":
+            return TemplateTracker(frame, box)
+        return OpenCVTracker(frame, box, self.tracker_type)
+
+    def reset(self):
+        """Forget tracked faces so the next frame runs a full detection."""
+        self.trackers = []
+
+    def locate(self, frame):
+        """Face boxes for this frame, from the tracker when possible."""
+        self.stats["frames"] += 1
+
+        if self.trackers and self.frames_since_detect < self.detect_every:
+            boxes = []
+            with self.metrics.time("tracking"):
+                for tracker in self.trackers:
+                    ok, box, confidence = tracker.update(frame)
+                    if not ok or confidence < self.min_confidence:
+                        self.stats["lost"] += 1
+                        break
+                    boxes.append(box)
+            if len(boxes) == len(self.trackers):
+                self.stats["tracked"] += 1
+                self.frames_since_detect += 1
+                return boxes
+
+        boxes = self.detect_fn(frame)
+        self.stats["detected"] += 1
+        self.frames_since_detect = 1
+        self.trackers = [self._new_tracker(frame, box) for box in boxes]
+        return boxes
+
+    def format_stats(self):
+        frames = max(1, self.stats["frames"])
+        return (f"[TRACK] {self.stats['frames']} frames: "
+                f"{self.stats['detected']} detected ({100 * self.stats['detected'] / frames:.0f}%), "
+                f"{self.stats['tracked']} tracked ({100 * self.stats['tracked'] / frames:.0f}%), "
+                f"{self.stats['lost']} forced re-detections")
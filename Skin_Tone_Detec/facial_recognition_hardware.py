@@ -1,22 +1,34 @@
 import face_recognition
 import cv2
-import numpy as np
-from picamera2 import Picamera2
+from face_index import FaceIndex
+from face_tracking import FaceTracker
+from identity_cache import IdentityCache
+from frame_sources import open_frame_source
+from stage_metrics import StageMetrics
 import time
-import pickle
 from gpiozero import LED
 
-# Load pre-trained face encodings
+# Load pre-trained face encodings (memory-mapped; converted from encodings.pickle
+# on the first run) into one float32 matrix for batched matching
 print("[INFO] loading encodings...")
-with open("encodings.pickle", "rb") as f:
-    data = pickle.loads(f.read())
-known_face_encodings = data["encodings"]
-known_face_names = data["names"]
+face_index = FaceIndex.from_store("encodings.npy")
 
-# Initialize the camera
-picam2 = Picamera2()
-picam2.configure(picam2.create_preview_configuration(main={"format": 'XRGB8888', "size": (1920, 1080)}))
-picam2.start()
+# Per-stage latency histograms, served at http://localhost:8009/metrics (set the port to None to disable)
+METRICS_PORT = 8009
+METRICS_LOG = None  # File to append a metrics snapshot to every METRICS_INTERVAL seconds
+METRICS_MQTT_BROKER = None  # e.g. "localhost" to also publish snapshots over MQTT
+METRICS_MQTT_TOPIC = "chroma/metrics/face_id"
+METRICS_INTERVAL = 5  # seconds
+
+metrics = StageMetrics()
+if METRICS_PORT:
+    metrics.serve_http(METRICS_PORT)
+metrics.start_reporting(METRICS_INTERVAL, log_path=METRICS_LOG,
+                        mqtt_broker=METRICS_MQTT_BROKER, mqtt_topic=METRICS_MQTT_TOPIC)
+
+# Initialize the camera, or replay recorded frames (JPEG folder, video file or .npy dump) if set
+REPLAY_PATH = None
+frame_source = open_frame_source(REPLAY_PATH, size=(1920, 1080), format='XRGB8888', convert=None, metrics=metrics)
 
 # Initialize GPIO
 output = LED(14)
@@ -24,8 +36,13 @@ output = LED(14)
 # Initialize our variables
 cv_scaler = 4 # this has to be a whole number
 
+# Full face detection every DETECT_EVERY frames, faces are tracked in between
+DETECT_EVERY = 5
+
+# A tracked face keeps its name until it moves, IDENTITY_TTL seconds pass or its match was marginal
+IDENTITY_TTL = 2.0
+
 face_locations = []
-face_encodings = []
 face_names = []
 frame_count = 0
 start_time = time.time()
@@ -34,42 +51,45 @@ fps = 0
 # List of names that will trigger the GPIO pin
 authorized_names = ["john", "alice", "bob"]  # Replace with names you wish to authorise THIS IS CASE-SENSITIVE
 
+def detect_faces(frame):
+    with metrics.time("detection"):
+        return face_recognition.face_locations(frame)
+
+face_tracker = FaceTracker(detect_faces, DETECT_EVERY, metrics=metrics)
+identity_cache = IdentityCache(ttl=IDENTITY_TTL)
+
 def process_frame(frame):
-    global face_locations, face_encodings, face_names
+    global face_locations, face_names
     
     # Resize the frame using cv_scaler to increase performance (less pixels processed, less time spent)
-    resized_frame = cv2.resize(frame, (0, 0), fx=(1/cv_scaler), fy=(1/cv_scaler))
+    with metrics.time("resize"):
+        resized_frame = cv2.resize(frame, (0, 0), fx=(1/cv_scaler), fy=(1/cv_scaler))
     
     # Convert the image from BGR to RGB colour space, the facial recognition library uses RGB, OpenCV uses BGR
-    rgb_resized_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
+    with metrics.time("colour_conversion"):
+        rgb_resized_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
     
-    # Find all the faces and face encodings in the current frame of video
-    face_locations = face_recognition.face_locations(rgb_resized_frame)
-    face_encodings = face_recognition.face_encodings(rgb_resized_frame, face_locations, model='large')
+    # Find all the faces in the current frame of video
+    face_locations = face_tracker.locate(rgb_resized_frame)
     
-    face_names = []
-    authorized_face_detected = False
+    def identify(boxes):
+        with metrics.time("encoding"):
+            face_encodings = face_recognition.face_encodings(rgb_resized_frame, boxes, model='large')
+        # Nearest known face for every face at once; "Unknown" beyond the match tolerance
+        with metrics.time("classification"):
+            return face_index.match(face_encodings)
     
-    for face_encoding in face_encodings:
-        # See if the face is a match for the known face(s)
-        matches = face_recognition.compare_faces(known_face_encodings, face_encoding)
-        name = "Unknown"
-        
-        # Use the known face with the smallest distance to the new face
-        face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-        best_match_index = np.argmin(face_distances)
-        if matches[best_match_index]:
-            name = known_face_names[best_match_index]
-            # Check if the detected face is in our authorized list
-            if name in authorized_names:
-                authorized_face_detected = True
-        face_names.append(name)
+    # Only faces that are new, moved, expired or marginal are encoded again
+    face_names = [name for name, distance in identity_cache.resolve(face_locations, identify)]
+    # Check if a detected face is in our authorized list
+    authorized_face_detected = any(name in authorized_names for name in face_names)
     
     # Control the GPIO pin based on face detection
-    if authorized_face_detected:
-        output.on()  # Turn on Pin
-    else:
-        output.off()  # Turn off Pin
+    with metrics.time("dispatch"):
+        if authorized_face_detected:
+            output.on()  # Turn on Pin
+        else:
+            output.off()  # Turn off Pin
     
     return frame
 
@@ -108,29 +128,37 @@ def calculate_fps():
 
 while True:
     # Capture a frame from camera
-    frame = picam2.capture_array()
+    frame = frame_source.read()
+    if frame is None:
+        break
     
     # Process the frame with the function
     processed_frame = process_frame(frame)
     
-    # Get the text and boxes to be drawn based on the processed frame
-    display_frame = draw_results(processed_frame)
-    
-    # Calculate and update FPS
-    current_fps = calculate_fps()
-    
-    # Attach FPS counter to the text and boxes
-    cv2.putText(display_frame, f"FPS: {current_fps:.1f}", (display_frame.shape[1] - 150, 30), 
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-    
-    # Display everything over the video feed.
-    cv2.imshow('Video', display_frame)
+    with metrics.time("display"):
+        # Get the text and boxes to be drawn based on the processed frame
+        display_frame = draw_results(processed_frame)
+        
+        # Calculate and update FPS
+        current_fps = calculate_fps()
+        
+        # Attach FPS counter to the text and boxes
+        cv2.putText(display_frame, f"FPS: {current_fps:.1f}", (display_frame.shape[1] - 150, 30), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        
+        # Display everything over the video feed.
+        cv2.imshow('Video', display_frame)
     
     # Break the loop and stop the script if 'q' is pressed
     if cv2.waitKey(1) == ord("q"):
         break
 
 # By breaking the loop we run this code here which closes everything
+print(face_tracker.format_stats())
+print(identity_cache.format_stats())
+print(metrics.format_summary())
+print(f"[METRICS] Slowest stage: {metrics.bottleneck()}")
+metrics.close()
 cv2.destroyAllWindows()
-picam2.stop()
+frame_source.close()
 output.off()  # Make sure to turn off the GPIO pin when exiting
\ No newline at end of file
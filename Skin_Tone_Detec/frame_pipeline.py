@@ -0,0 +1,171 @@
+import threading
+from collections import deque
+
+class DropOldestQueue:
+    """Bounded queue that discards its oldest item instead of blocking the producer."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = deque()
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def put(self, item):
+        with self.condition:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Oldest item, or None if nothing arrived within `timeout` seconds."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items, timeout):
+                return None
+            return self.items.popleft()
+
+    def wait(self, timeout=None):
+        """Block until an item is available, without taking it."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.items, timeout)
+
+    def __len__(self):
+        return len(self.items)
+
+class FramePipeline:
+    """Capture thread -> inference worker(s) -> results consumed by the display loop.
+
+    `capture_fn()` returns the next frame, or None once the source is exhausted.
+    `processor_factory()` is called once per worker so stateful processors
+    (trackers, ROI detectors) are never shared between threads; each processor
+    is called as `processor(frame)` and may define `reset()`.
+
+    Every frame is tagged with the reset generation it was captured in; after
+    `request_reset()` frames and results from before the reset are discarded,
+    so nothing captured before the reset reaches the consumer.
+    """
+
+    def __init__(self, capture_fn, processor_factory, workers=1, queue_size=2):
+        self.capture_fn = capture_fn
+        self.frames = DropOldestQueue(queue_size)
+        self.results = DropOldestQueue(queue_size)
+        self.processors = [processor_factory() for _ in range(workers)]
+        self.stop_event = threading.Event()
+        self.capture_done = threading.Event()
+        self.reset_generation = 0
+        self.last_seq = -1
+        self.stale_results = 0
+        self.pre_reset = 0  # Frames and results discarded because they predate a reset
+        self.in_flight = 0
+        self.in_flight_lock = threading.Lock()
+        self.error = None
+
+        self.threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        for index, processor in enumerate(self.processors):
+            self.threads.append(threading.Thread(
+                target=self._inference_loop, args=(processor,), name=f"inference-{index}", daemon=True))
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def _capture_loop(self):
+        seq = 0
+        try:
+            while not self.stop_event.is_set():
+                # Read before capturing: a reset requested during the capture makes this frame stale
+                generation = self.reset_generation
+                frame = self.capture_fn()
+                if frame is None:
+                    break
+                self.frames.put((seq, generation, frame))
+                seq += 1
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+        finally:
+            self.capture_done.set()
+
+    def _inference_loop(self, processor):
+        generation = self.reset_generation
+        try:
+            while not self.stop_event.is_set():
+                with self.in_flight_lock:
+                    item = self.frames.get(timeout=0)
+                    if item is not None:
+                        self.in_flight += 1
+                if item is None:
+                    self.frames.wait(timeout=0.1)
+                    continue
+                seq, frame_generation, frame = item
+                try:
+                    if frame_generation < self.reset_generation:
+                        with self.in_flight_lock:
+                            self.pre_reset += 1
+                        continue
+                    if frame_generation != generation:
+                        generation = frame_generation
+                        if hasattr(processor, "reset"):
+                            processor.reset()
+                    self.results.put((seq, frame_generation, frame, processor(frame)))
+                finally:
+                    with self.in_flight_lock:
+                        self.in_flight -= 1
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+
+    def next_result(self, timeout=0.05):
+        """Next (seq, frame, output) in capture order, or None if none is ready.
+
+        With several workers results can finish out of order; anything older
+        than the last result handed out is skipped, as is anything captured
+        before the last `request_reset()`.
+        """
+        while True:
+            if self.error is not None:
+                raise self.error
+            item = self.results.get(timeout)
+            if item is None:
+                return None
+            seq, generation, frame, output = item
+            if generation < self.reset_generation:
+                with self.in_flight_lock:
+                    self.pre_reset += 1
+            elif seq > self.last_seq:
+                self.last_seq = seq
+                return seq, frame, output
+            else:
+                self.stale_results += 1
+
+    def finished(self):
+        """True once the source is exhausted and every frame has been processed and consumed."""
+        with self.in_flight_lock:
+            return (self.capture_done.is_set() and not self.frames
+                    and not self.in_flight and not self.results)
+
+    def request_reset(self):
+        """Discard everything captured so far and reset each worker's processor before its next frame."""
+        self.reset_generation += 1
+
+    def queue_depths(self):
+        return {
+            "capture": len(self.frames),
+            "results": len(self.results),
+            "dropped_frames": self.frames.dropped,
+            "dropped_results": self.results.dropped,
+            "stale_results": self.stale_results,
+            "pre_reset": self.pre_reset,
+        }
+
+    def format_depths(self):
+        depths = self.queue_depths()
+        return (f"Q cap {depths['capture']} res {depths['results']} | "
+                f"dropped {depths['dropped_frames']}/{depths['dropped_results']}")
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=2)
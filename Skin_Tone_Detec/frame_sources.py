@@ -0,0 +1,209 @@
+import os
+import time
+import cv2
+import numpy as np
+from stage_metrics import NO_METRICS
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Frame rate used to pace replays of JPEG folders and frame dumps in real time
+REPLAY_FPS = 30
+
+# Size of the camera's low-resolution YUV420 stream whose Y plane face detection runs on
+LORES_SIZE = (640, 480)
+
+class CameraFrame(np.ndarray):
+    """A BGR frame that also carries the luma plane of a lower-resolution stream of the same capture.
+
+    It behaves as a plain ndarray everywhere; detectors that find a `luma`
+    attribute run on it instead of converting and resizing the colour frame.
+    """
+
+    luma = None
+
+    def __array_finalize__(self, obj):
+        # Slices and copies do not inherit the luma plane; use crop_frame for crops
+        self.luma = None
+
+def with_luma(frame, luma):
+    frame = frame.view(CameraFrame)
+    frame.luma = luma
+    return frame
+
+def luma_scale(frame):
+    """(y, x) factors from frame coordinates to luma coordinates."""
+    return frame.luma.shape[0] / frame.shape[0], frame.luma.shape[1] / frame.shape[1]
+
+def crop_frame(frame, y0, y1, x0, x1):
+    """frame[y0:y1, x0:x1], keeping the matching part of the luma plane if the frame has one."""
+    crop = frame[y0:y1, x0:x1]
+    luma = getattr(frame, "luma", None)
+    if luma is None:
+        return crop
+    scale_y, scale_x = luma_scale(frame)
+    return with_luma(crop, luma[round(y0 * scale_y):round(y1 * scale_y), round(x0 * scale_x):round(x1 * scale_x)])
+
+class Picamera2Source:
+    """Live frames from the Pi camera, converted the way the detector scripts expect.
+
+    With `lores` (a (width, height) size) the camera also produces a YUV420
+    stream of that size and every frame is a CameraFrame whose `luma` is a
+    view of its Y plane. The main stream is then captured as "RGB888", which
+    libcamera stores in B, G, R order: the same layout the RGB2BGR conversion
+    produced, so no colour conversion runs at all.
+    """
+
+    def __init__(self, tuning_file=None, size=(1280, 960), format=None, convert=cv2.COLOR_RGB2BGR,
+                 lores=None, camera_num=0, metrics=NO_METRICS):
+        # Imported here so the rest of the pipeline runs on machines without libcamera
+        from picamera2 import Picamera2
+
+        if tuning_file:
+            self.picam2 = Picamera2(camera_num, tuning=tuning_file)
+        else:
+            self.picam2 = Picamera2(camera_num)
+        main = {"size": size}
+        self.lores = lores
+        if lores:
+            format, convert = "RGB888", None
+        if format:
+            main["format"] = format
+        if lores:
+            config = self.picam2.create_preview_configuration(main=main, lores={"size": lores, "format": "YUV420"})
+        else:
+            config = self.picam2.create_preview_configuration(main=main)
+        self.picam2.configure(config)
+        self.picam2.start()
+        self.convert = convert
+        self.metrics = metrics
+
+    def read(self):
+        if self.lores:
+            with self.metrics.time("capture"):
+                # Both streams from the same request, so the luma matches the colour frame
+                (frame, yuv), _ = self.picam2.capture_arrays(["main", "lores"])
+            width, height = self.lores
+            # The first `height` rows of a YUV420 buffer are the Y plane; slicing is a view, not a copy
+            return with_luma(frame, yuv[:height, :width])
+
+        with self.metrics.time("capture"):
+            frame = self.picam2.capture_array()
+        if self.convert is None:
+            return frame
+        with self.metrics.time("colour_conversion"):
+            return cv2.cvtColor(frame, self.convert)
+
+    def close(self):
+        self.picam2.stop()
+
+class ReplaySource:
+    """Replays recorded BGR frames from a JPEG/PNG folder, a video file or a .npy frame dump.
+
+    With `realtime` the frames are paced at the recording's frame rate, otherwise
+    they are returned as fast as they can be decoded. `read()` returns None
+    once the recording is exhausted (unless `loop` is set).
+    """
+
+    def __init__(self, path, realtime=False, fps=None, loop=False, metrics=NO_METRICS):
+        self.path = path
+        self.metrics = metrics
+        self.realtime = realtime
+        self.loop = loop
+        self.index = 0
+        self.next_due = None
+        self.capture = None
+        self.files = None
+        self.dump = None
+
+        if os.path.isdir(path):
+            self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.lower().endswith(IMAGE_EXTENSIONS))
+            self.fps = fps or REPLAY_FPS
+        elif path.endswith(".npy"):
+            # (N, H, W, 3) uint8, memory-mapped so only the frames being replayed are paged in
+            self.dump = np.load(path, mmap_mode="r")
+            self.fps = fps or REPLAY_FPS
+        else:
+            self.capture = cv2.VideoCapture(path)
+            if not self.capture.isOpened():
+                raise ValueError(f"Cannot open replay source: {path}")
+            self.fps = fps or self.capture.get(cv2.CAP_PROP_FPS) or REPLAY_FPS
+
+    def __len__(self):
+        if self.files is not None:
+            return len(self.files)
+        if self.dump is not None:
+            return len(self.dump)
+        return int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def _next_frame(self):
+        if self.files is not None:
+            if self.index >= len(self.files):
+                return None
+            frame = cv2.imread(self.files[self.index])
+        elif self.dump is not None:
+            if self.index >= len(self.dump):
+                return None
+            frame = np.array(self.dump[self.index])  # writable copy, callers draw on frames
+        else:
+            ok, frame = self.capture.read()
+            if not ok:
+                return None
+        self.index += 1
+        return frame
+
+    def rewind(self):
+        self.index = 0
+        if self.capture is not None:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def read(self):
+        with self.metrics.time("capture"):
+            frame = self._next_frame()
+            if frame is None and self.loop and self.index > 0:
+                self.rewind()
+                frame = self._next_frame()
+        if frame is None:
+            return None
+
+        if self.realtime:
+            now = time.perf_counter()
+            if self.next_due is None:
+                self.next_due = now
+            elif self.next_due > now:
+                time.sleep(self.next_due - now)
+            self.next_due += 1.0 / self.fps
+        return frame
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+
+def write_frame_dump(source, path, count):
+    """Record up to `count` frames from any source into a memory-mappable .npy dump."""
+    first = source.read()
+    if first is None:
+        raise ValueError("Source produced no frames")
+    dump = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(count,) + first.shape)
+    dump[0] = first
+    written = 1
+    while written < count:
+        frame = source.read()
+        if frame is None:
+            break
+        dump[written] = frame
+        written += 1
+    dump.flush()
+    del dump
+    if written < count:
+        # Trim to the frames actually recorded
+        trimmed = np.array(np.load(path, mmap_mode="r")[:written])
+        np.save(path, trimmed)
+    return written
+
+def open_frame_source(replay_path=None, realtime=True, metrics=NO_METRICS, **camera_options):
+    """ReplaySource when `replay_path` is set, otherwise the Pi camera."""
+    if replay_path:
+        print(f"[INFO] Replaying frames from {replay_path}")
+        return ReplaySource(replay_path, realtime=realtime, metrics=metrics)
+    return Picamera2Source(metrics=metrics, **camera_options)
@@ -0,0 +1,93 @@
+import time
+from face_index import TOLERANCE
+
+# Reuse a cached identity while the face box overlaps the box it was encoded at by at least this IoU
+MIN_IOU = 0.5
+
+# Re-encode every face at least this often (seconds), even if it has not moved
+IDENTITY_TTL = 2.0
+
+# Matches within this distance of the tolerance are re-encoded on the next frame
+MARGIN = 0.05
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    intersection = max(0, bottom - top) * max(0, right - left)
+    if not intersection:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+class CachedIdentity:
+    def __init__(self, box, name, distance, encoded_at):
+        self.box = box  # where the face was when it was encoded
+        self.name = name
+        self.distance = distance
+        self.encoded_at = encoded_at
+
+class IdentityCache:
+    """Reuses the name found for a face while it stays put, so it is not re-encoded every frame.
+
+    `resolve(boxes, identify)` returns (name, distance) for each box. A box takes
+    over the identity of the cached face it overlaps most; `identify(boxes)` is
+    only called for boxes with no such face, or whose face moved by more than
+    `min_iou`, was encoded over `ttl` seconds ago, or matched within `margin`
+    of the tolerance.
+    """
+
+    def __init__(self, min_iou=MIN_IOU, ttl=IDENTITY_TTL, margin=MARGIN, tolerance=TOLERANCE):
+        self.min_iou = min_iou
+        self.ttl = ttl
+        self.margin = margin
+        self.tolerance = tolerance
+        self.entries = []
+        self.stats = {"reused": 0, "new": 0, "expired": 0, "marginal": 0}
+
+    def reset(self):
+        self.entries = []
+
+    def _marginal(self, entry):
+        return abs(entry.distance - self.tolerance) < self.margin
+
+    def resolve(self, boxes, identify):
+        now = time.monotonic()
+        resolved = [None] * len(boxes)
+        unclaimed = list(self.entries)
+        to_encode = []
+
+        for index, box in enumerate(boxes):
+            overlaps = [(box_iou(box, entry.box), entry) for entry in unclaimed]
+            iou, entry = max(overlaps, key=lambda overlap: overlap[0], default=(0.0, None))
+            if entry is None or iou < self.min_iou:
+                reason = "new"
+            else:
+                unclaimed.remove(entry)
+                if now - entry.encoded_at > self.ttl:
+                    reason = "expired"
+                elif self._marginal(entry):
+                    reason = "marginal"
+                else:
+                    resolved[index] = entry
+                    self.stats["reused"] += 1
+                    continue
+            self.stats[reason] += 1
+            to_encode.append(index)
+
+        if to_encode:
+            results = identify([boxes[index] for index in to_encode])
+            for index, (name, distance) in zip(to_encode, results):
+                resolved[index] = CachedIdentity(boxes[index], name, distance, now)
+
+        # Faces that left the frame are forgotten
+        self.entries = resolved
+        return [(entry.name, entry.distance) for entry in resolved]
+
+    def format_stats(self):
+        lookups = max(1, sum(self.stats.values()))
+        return (f"[IDENTITY] {self.stats['reused']} of {lookups} faces reused "
+                f"({100 * self.stats['reused'] / lookups:.0f}%), re-encoded: "
+                f"{self.stats['new']} new/moved, {self.stats['expired']} expired, "
+                f"{self.stats['marginal']} marginal")
@@ -1,7 +1,7 @@
 import os
 import cv2
-from datetime import datetime
 from picamera2 import Picamera2
+from image_writer import AsyncImageWriter, burst_paths
 
 # Set tuning file path for Arducam
 TUNING_FILE = "/home/chroma/Arducam-477P-Pi4.json"
@@ -10,6 +10,10 @@ TUNING_FILE = "/home/chroma/Arducam-477P-Pi4.json"
 DATASET_FOLDER = "dataset"
 PERSON_NAME = "Camera_Test"
 
+# Frames saved per SPACE press, one per preview frame; JPEGs are written in the background
+BURST_COUNT = 1
+WRITER_QUEUE_SIZE = 32
+
 # Create dataset folder if it doesn't exist
 def create_folder(name):
     if not os.path.exists(DATASET_FOLDER):
@@ -32,6 +36,8 @@ def initialize_camera():
 def capture_photos():
     folder = create_folder(PERSON_NAME)
     picam2 = initialize_camera()
+    writer = AsyncImageWriter(WRITER_QUEUE_SIZE)
+    burst_remaining = []  # Paths still to fill for the current burst
 
     print("Press SPACE to capture an image, 'Q' to quit.")
 
@@ -39,16 +45,16 @@ def capture_photos():
         frame = picam2.capture_array()
         frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)  # Convert to OpenCV format
 
+        if burst_remaining:
+            writer.save(burst_remaining.pop(0), frame)
+
         cv2.imshow("Live Camera Feed", frame)
 
         key = cv2.waitKey(1) & 0xFF
 
         if key == ord(' '):  # Space key to capture
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{PERSON_NAME}_{timestamp}.jpg"
-            filepath = os.path.join(folder, filename)
-            cv2.imwrite(filepath, frame)
-            print(f"Photo saved: {filepath}")
+            burst_remaining = burst_paths(folder, PERSON_NAME, BURST_COUNT)
+            writer.save(burst_remaining.pop(0), frame)
 
         elif key == ord('q'):  # 'Q' key to quit
             print("Exiting program...")
@@ -57,6 +63,9 @@ def capture_photos():
     # Cleanup
     cv2.destroyAllWindows()
     picam2.stop()
+    print("Waiting for pending photos to be written...")
+    writer.close()
+    print(writer.format_stats())
 
 # Run the program
 if __name__ == "__main__":
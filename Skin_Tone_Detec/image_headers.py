@@ -0,0 +1,43 @@
+import struct
+
+# JPEG start-of-frame markers (every SOFn except DHT, JPG and DAC) carry the image size
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def _jpeg_size(file):
+    """(width, height) from the first SOF segment; `file` is positioned after the SOI marker."""
+    while True:
+        byte = file.read(1)
+        while byte and byte != b"\xff":
+            byte = file.read(1)  # Tolerate garbage between segments
+        while byte == b"\xff":
+            byte = file.read(1)  # Fill bytes
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue  # Standalone markers have no length
+        length_bytes = file.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            segment = file.read(5)
+            if len(segment) < 5:
+                return None
+            height, width = struct.unpack(">xHH", segment)
+            return width, height
+        file.seek(length - 2, 1)
+
+def read_image_header(path):
+    """("jpeg" | "png", width, height) read from the file header without decoding, or None."""
+    with open(path, "rb") as file:
+        head = file.read(24)
+        if head[:2] == b"\xff\xd8":
+            file.seek(2)
+            size = _jpeg_size(file)
+            return ("jpeg",) + size if size else None
+        if head[:8] == PNG_SIGNATURE and head[12:16] == b"IHDR":
+            width, height = struct.unpack(">II", head[16:24])
+            return "png", width, height
+    return None
@@ -0,0 +1,97 @@
+import os
+import queue
+import threading
+import cv2
+from datetime import datetime
+
+# Frames waiting to be encoded before new captures are dropped (~3.7 MB each at 1280x960)
+QUEUE_SIZE = 32
+
+# Frames saved per keypress
+BURST_COUNT = 1
+
+class AsyncImageWriter:
+    """Encodes and saves captured frames on a background thread so the preview loop never waits on disk.
+
+    `save()` only enqueues the frame; the caller must not draw on it afterwards.
+    When the queue is full the new frame is dropped and counted rather than
+    blocking the preview.
+    """
+
+    def __init__(self, queue_size=QUEUE_SIZE, workers=1, params=None):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.params = params or []
+        self.lock = threading.Lock()
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "max_backlog": 0}
+        self.threads = [threading.Thread(target=self._write_loop, name=f"image-writer-{index}", daemon=True)
+                        for index in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def save(self, path, frame):
+        """Queue `frame` for writing to `path`; returns False if it was dropped."""
+        try:
+            self.queue.put_nowait((path, frame))
+        except queue.Full:
+            with self.lock:
+                self.stats["dropped"] += 1
+            print(f"[WRITER] Disk is behind, dropped {path}")
+            return False
+        with self.lock:
+            self.stats["queued"] += 1
+            self.stats["max_backlog"] = max(self.stats["max_backlog"], self.queue.qsize())
+        return True
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            path, frame = item
+            try:
+                # cv2.imwrite releases the GIL while encoding
+                ok = cv2.imwrite(path, frame, self.params)
+                error = None if ok else "encoder refused the frame"
+            except Exception as e:
+                error = e
+            with self.lock:
+                self.stats["written" if error is None else "failed"] += 1
+            if error is None:
+                print(f"Photo saved: {path}")
+            else:
+                print(f"[WRITER] Error saving {path}: {error}")
+            self.queue.task_done()
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def format_stats(self):
+        with self.lock:
+            return f"[WRITER] {self.stats}, pending: {self.pending()}"
+
+    def close(self, wait=True):
+        """Stop the writer threads; with `wait` every queued frame is written first."""
+        if wait:
+            self.queue.join()
+        else:
+            # Discard what has not been picked up yet
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.queue.task_done()
+        for _ in self.threads:
+            self.queue.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+def burst_paths(folder, prefix, count=BURST_COUNT, extension=".jpg"):
+    """File names for one keypress worth of frames."""
+    # Milliseconds keep two presses within the same second apart
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+    if count == 1:
+        return [os.path.join(folder, f"{prefix}_{timestamp}{extension}")]
+    return [os.path.join(folder, f"{prefix}_{timestamp}_{index:02d}{extension}") for index in range(count)]
@@ -1,12 +1,43 @@
 import cv2
 import os
+import json
+import argparse
 import numpy as np
 import csv
+from concurrent.futures import ProcessPoolExecutor
+from image_headers import read_image_header
+from reference_store import write_reference_store
+from tone_lookup import ToneLookupTable
 
 # Dataset directory
 DATASET_DIR = "dataset"
 OUTPUT_CSV = "monk_skin_tones.csv"
 
+# Per-image record of (mtime, size, samples) so unchanged images are not decoded again
+MANIFEST_PATH = "monk_skin_tones.manifest.json"
+MANIFEST_VERSION = 1
+
+# Faces are sampled as if resized to SAMPLE_SIZE x SAMPLE_SIZE, at these (y, x) fractions
+SAMPLE_SIZE = 400
+SAMPLE_POINTS = [
+    (0.2, 0.4),  # Forehead center
+    (0.3, 0.2),  # Left cheek
+    (0.3, 0.8),  # Right cheek
+    (0.6, 0.4),  # Chin center
+]
+
+# Decode JPEGs at 1/2, 1/4 or 1/8 scale (DCT scaling) when the result still
+# covers the sample grid; False restores the full decode + resize of every image.
+# The reduced decode averages each 2x2..8x8 block, so on textured photos the
+# samples differ from the full decode + resize by up to ~12 levels per channel
+# (~2 on smooth images). Switching this re-extracts every image, shifts the
+# reference CSV and so rebuilds the detectors' lookup table on their next start.
+REDUCED_DECODE = True
+REDUCED_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+
+# Extraction processes; None uses every core
+WORKERS = None
+
 def extract_rgb_samples(image_path):
     """ Extract multiple RGB values from different regions of the face. """
     img = cv2.imread(image_path)
@@ -29,41 +60,159 @@ def extract_rgb_samples(image_path):
 
     return rgb_samples
 
-def process_dataset():
-    """ Process dataset, extract multiple RGB values per Monk Skin Tone, and save to CSV. """
-    monk_tone_data = []
+def decode_flag(image_path):
+    """ Strongest JPEG reduction that still leaves at least SAMPLE_SIZE pixels per side. """
+    header = read_image_header(image_path)
+    if header and header[0] == "jpeg":
+        _, width, height = header
+        for factor, flag in REDUCED_FLAGS:
+            if min(width, height) // factor >= SAMPLE_SIZE:
+                return flag
+    return cv2.IMREAD_COLOR
+
+def extract_rgb_samples_reduced(image_path):
+    """ Same four samples as extract_rgb_samples without decoding or resizing the full image.
+
+    Only the 2x2 neighbourhood of each sample point is read and blended with the
+    bilinear weights cv2.resize would have used for that output pixel, so the
+    values match the resize path to within rounding at full decode scale. At a
+    reduced scale each pixel is a block average, so texture (pores, hair,
+    JPEG noise) is smoothed out and the values drift from the resize path.
+    """
+    img = cv2.imread(image_path, decode_flag(image_path))
+    if img is None:
+        raise ValueError("could not decode image")
+    h, w, _ = img.shape
+
+    rgb_samples = []
+    for fy, fx in SAMPLE_POINTS:
+        y, x = int(SAMPLE_SIZE * fy), int(SAMPLE_SIZE * fx)
+        # Source coordinate of output pixel (y, x), as in cv2.resize's INTER_LINEAR
+        sy = min(max((y + 0.5) * h / SAMPLE_SIZE - 0.5, 0), h - 1)
+        sx = min(max((x + 0.5) * w / SAMPLE_SIZE - 0.5, 0), w - 1)
+        y0, x0 = int(sy), int(sx)
+        y1, x1 = min(y0 + 1, h - 1), min(x0 + 1, w - 1)
+        wy, wx = sy - y0, sx - x0
+        patch = img[[y0, y0, y1, y1], [x0, x1, x0, x1]].astype(np.float32)
+        weights = np.array([(1 - wy) * (1 - wx), (1 - wy) * wx, wy * (1 - wx), wy * wx], dtype=np.float32)
+        bgr = np.rint(weights @ patch).astype(np.uint8)
+        rgb_samples.append(bgr[::-1])  # BGR to RGB
+
+    return rgb_samples
 
-    for monk_tone in sorted(os.listdir(DATASET_DIR)):  # Iterate over monk_1, monk_2, ..., monk_10
-        monk_tone_dir = os.path.join(DATASET_DIR, monk_tone)
+def dataset_images(dataset_dir=DATASET_DIR):
+    """ (monk_tone, image_path) for every image under dataset/monk_*/<subject>/, in a fixed order. """
+    images = []
+    for monk_tone in sorted(os.listdir(dataset_dir)):  # Iterate over monk_1, monk_2, ..., monk_10
+        monk_tone_dir = os.path.join(dataset_dir, monk_tone)
 
         if not os.path.isdir(monk_tone_dir):
             continue  # Skip if not a directory
 
-        for subject in os.listdir(monk_tone_dir):  # Iterate over subject folders
+        for subject in sorted(os.listdir(monk_tone_dir)):  # Iterate over subject folders
             subject_dir = os.path.join(monk_tone_dir, subject)
 
             if not os.path.isdir(subject_dir):
                 continue  # Skip non-folder files
 
-            for img_file in os.listdir(subject_dir):  # Iterate over images
-                img_path = os.path.join(subject_dir, img_file)
-
-                try:
-                    rgb_samples = extract_rgb_samples(img_path)
-
-                    for rgb in rgb_samples:
-                        monk_tone_data.append([monk_tone, rgb[0], rgb[1], rgb[2]])  # Save multiple samples
-
-                except Exception as e:
-                    print(f"Error processing {img_path}: {e}")
+            for img_file in sorted(os.listdir(subject_dir)):  # Iterate over images
+                images.append((monk_tone, os.path.join(subject_dir, img_file)))
+    return images
+
+def _extract_worker(img_path):
+    """ Runs in a pool process; returns plain ints so results pickle cheaply. """
+    extract = extract_rgb_samples_reduced if REDUCED_DECODE else extract_rgb_samples
+    try:
+        return img_path, [[int(v) for v in rgb] for rgb in extract(img_path)], None
+    except Exception as e:
+        return img_path, None, str(e)
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    try:
+        with open(manifest_path, "r") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    # Samples taken with the other extraction path are not reused
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    if manifest.get("reduced_decode") != REDUCED_DECODE:
+        print(f"[INFO] REDUCED_DECODE changed to {REDUCED_DECODE}: re-extracting every image; "
+              f"the reference samples will shift.")
+        return {}
+    return manifest["images"]
+
+def save_manifest(images, manifest_path=MANIFEST_PATH):
+    with open(manifest_path + ".tmp", "w") as file:
+        json.dump({"version": MANIFEST_VERSION, "reduced_decode": REDUCED_DECODE, "images": images}, file)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def process_dataset(workers=WORKERS, full=False):
+    """ Process dataset, extract multiple RGB values per Monk Skin Tone, and save to CSV.
+
+    Only images that are new or whose mtime/size changed since the last run are
+    decoded (in a process pool); samples of unchanged images come from the
+    manifest and removed images are dropped. `full` ignores the manifest.
+    """
+    previous = {} if full or not os.path.exists(OUTPUT_CSV) else load_manifest()
+    images = {}
+    pending = []
+
+    for monk_tone, img_path in dataset_images():
+        stat = os.stat(img_path)
+        entry = previous.get(img_path)
+        if entry and entry["tone"] == monk_tone and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            images[img_path] = entry
+        else:
+            images[img_path] = {"tone": monk_tone, "mtime": stat.st_mtime, "size": stat.st_size, "samples": None}
+            pending.append(img_path)
+
+    removed = len(set(previous) - set(images))
+    print(f"[INFO] {len(images)} images: {len(pending)} to extract, "
+          f"{len(images) - len(pending)} unchanged, {removed} removed.")
+    if not pending and not removed:
+        print(f"Nothing changed; {OUTPUT_CSV} is up to date.")
+        return
+
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(pending) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for img_path, rgb_samples, error in pool.map(_extract_worker, pending, chunksize=chunksize):
+                if error is None:
+                    images[img_path]["samples"] = rgb_samples
+                else:
+                    print(f"Error processing {img_path}: {error}")
+                    del images[img_path]  # Not recorded, so it is retried next run
+                    pending.remove(img_path)
+        if not pending and not removed:
+            print(f"No new samples; {OUTPUT_CSV} is unchanged.")
+            return
 
     # Save data to CSV
-    with open(OUTPUT_CSV, "w", newline="") as file:
+    monk_tone_data = []
+    for entry in images.values():
+        for rgb in entry["samples"]:
+            monk_tone_data.append([entry["tone"], rgb[0], rgb[1], rgb[2]])  # Save multiple samples
+
+    with open(OUTPUT_CSV + ".tmp", "w", newline="") as file:
         writer = csv.writer(file)
         writer.writerow(["Monk_Tone", "R", "G", "B"])  # Header
         writer.writerows(monk_tone_data)
+    os.replace(OUTPUT_CSV + ".tmp", OUTPUT_CSV)
+    # Manifest last: if the CSV write fails the next run extracts the same images again
+    save_manifest(images)
 
     print(f"Processing complete. Extracted RGB samples saved to {OUTPUT_CSV}.")
 
+    # Binary copy of the CSV and the RGB -> tone lookup table, both memory-mapped
+    # by the detectors at startup
+    write_reference_store(OUTPUT_CSV)
+    ToneLookupTable.load_or_build(OUTPUT_CSV)
+
 if __name__ == "__main__":
-    process_dataset()
+    parser = argparse.ArgumentParser(description="Extract Monk skin tone RGB samples from the dataset.")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="extraction processes (default: all cores)")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-extract every image")
+    args = parser.parse_args()
+    process_dataset(workers=args.workers, full=args.full)
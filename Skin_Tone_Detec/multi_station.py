@@ -0,0 +1,212 @@
+import os
+import cv2
+import time
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from tone_lookup import ToneLookupTable
+from skin_tone_classifier import get_average_face_rgb
+from face_detection import DETECTION_SCALE, RoiFaceDetector, detection_image, scale_boxes
+from face_tracking import FaceTracker
+from wled_dispatch import WledDispatcher
+from tone_decision import ToneDecision
+from frame_sources import open_frame_source
+from stage_metrics import StageMetrics, NO_METRICS
+
+# Configurations
+TUNING_FILE = "/home/chroma/Arducam-477P-Pi4.json"
+CSV_PATH = "/home/chroma/Desktop/Face Recognition/monk_skin_tones.csv"
+SAMPLE_COUNT = 7  # Most samples the vote waits for before deciding
+MIN_SAMPLES = 3  # Fewest samples an early decision may be based on
+VOTE_CONFIDENCE = 0.8  # Leader share needed to decide before SAMPLE_COUNT
+DETECT_EVERY = 5  # Full HOG detection every N frames, faces are tracked in between
+TRACKER_TYPE = "template"  # or an OpenCV tracker such as "MOSSE" / "KCF"
+LORES_SIZE = (640, 480)  # Camera YUV420 stream whose Y plane HOG runs on (None: resize the colour frame)
+DETECTOR_WORKERS = None  # HOG processes shared by every station; None: one per station, at most one per core
+HEADLESS = False  # True runs without preview windows (stop with Ctrl+C)
+METRICS_PORT = 8010  # Per-stage latency JSON at http://localhost:8010/metrics (None to disable)
+
+# One entry per booth: a camera (camera_num) or a recording ("replay": JPEG folder,
+# video file or .npy frame dump), and the WLED lightboxes that booth drives
+STATIONS = [
+    {"name": "booth1", "camera_num": 0, "wled_ips": ["192.168.1.231", "192.168.1.233"]},
+    {"name": "booth2", "camera_num": 1, "wled_ips": ["192.168.1.235", "192.168.1.237"]},
+]
+
+def _load_detector():
+    """Pool initializer: load dlib's HOG model once per worker process."""
+    global face_recognition
+    import face_recognition
+
+def _detect(image):
+    return face_recognition.face_locations(image, model="hog")
+
+def detector_workers():
+    """Pool size: each station waits for its own detection, so more workers than stations would sit idle."""
+    if DETECTOR_WORKERS:
+        return DETECTOR_WORKERS
+    return max(1, min(os.cpu_count() or 1, len(STATIONS)))
+
+class PooledFaceDetector:
+    """Drop-in for detect_faces that runs HOG in the shared process pool.
+
+    Only the small detection image (the luma plane or the downscaled frame)
+    crosses the process boundary; boxes come back in full-frame coordinates.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __call__(self, frame, scale=DETECTION_SCALE, metrics=NO_METRICS):
+        image, scale_y, scale_x = detection_image(frame, scale, metrics)
+        # Includes the wait for a free worker, so pool contention shows up here
+        with metrics.time("detection"):
+            boxes = self.pool.submit(_detect, image).result()
+        return scale_boxes(boxes, scale_y, scale_x)
+
+class Station:
+    """One booth: its frame source, tracker, vote and lightboxes, run on its own thread.
+
+    The lookup table and the detector pool are shared with every other station.
+    """
+
+    def __init__(self, config, pool, lookup, metrics=NO_METRICS):
+        self.name = config["name"]
+        self.lookup = lookup
+        self.metrics = metrics
+        self.source = open_frame_source(config.get("replay"), tuning_file=TUNING_FILE, lores=LORES_SIZE,
+                                        camera_num=config.get("camera_num", 0), metrics=metrics)
+        # Same ROI-first detection as face_recog_3.0.py, with the HOG search itself in the pool
+        self.roi_detector = RoiFaceDetector(metrics=metrics, detect_fn=PooledFaceDetector(pool))
+        self.tracker = FaceTracker(self.roi_detector, detect_every=DETECT_EVERY,
+                                   tracker_type=TRACKER_TYPE, metrics=metrics)
+        self.wled = WledDispatcher(config["wled_ips"])
+        self.decision = ToneDecision(self.wled, max_samples=SAMPLE_COUNT, min_samples=MIN_SAMPLES,
+                                     confidence=VOTE_CONFIDENCE, metrics=metrics, name=self.name)
+
+        self.latest = None  # (frame, faces, sampling_active) of the newest processed frame, for display
+        self.latest_lock = threading.Lock()
+        self.reset_requested = threading.Event()
+        self.stop_event = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name=f"station-{self.name}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def request_reset(self):
+        """Reset on the station's own thread, so the vote and tracker are never shared."""
+        self.reset_requested.set()
+
+    def _reset(self):
+        self.reset_requested.clear()
+        self.tracker.reset()
+        self.roi_detector.reset()
+        self.decision.reset()
+
+    def _run(self):
+        try:
+            while not self.stop_event.is_set():
+                if self.reset_requested.is_set():
+                    self._reset()
+                frame = self.source.read()
+                if frame is None:
+                    break
+
+                faces = []
+                for face_location in self.tracker.locate(frame):
+                    with self.metrics.time("classification"):
+                        avg_rgb = get_average_face_rgb(frame, face_location)
+                        tone = self.lookup.classify(avg_rgb)
+                    faces.append((face_location, tone))
+                    self.decision.sample(tone, avg_rgb)
+
+                with self.latest_lock:
+                    self.latest = (frame, faces, self.decision.sampling_active)
+        except Exception as e:
+            self.error = e
+            print(f"[{self.name}] Stopped: {e}")
+        finally:
+            self.done.set()
+
+    def take_latest(self):
+        """Newest processed frame and its faces, or None if nothing new arrived."""
+        with self.latest_lock:
+            latest, self.latest = self.latest, None
+        return latest
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=2)
+        self.wled.close()
+        self.source.close()
+
+    def format_stats(self):
+        return "\n".join(f"[{self.name}] {line}" for line in
+                         (self.decision.format_stats(), self.wled.format_stats(), self.tracker.format_stats(),
+                          self.roi_detector.format_stats()))
+
+def draw_station(station, frame, faces, sampling_active):
+    for (top, right, bottom, left), tone in faces:
+        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 3)
+        cv2.putText(frame, tone, (left + 6, bottom + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        if not sampling_active:
+            cv2.putText(frame, "WAITING FOR RESET", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+    cv2.imshow(f"Skin Tone Detection - {station.name}", frame)
+
+def main():
+    metrics = StageMetrics()
+    if METRICS_PORT:
+        metrics.serve_http(METRICS_PORT)
+
+    # Loaded once: the table is memory-mapped and read by every station thread
+    lookup = ToneLookupTable.load_or_build(CSV_PATH)
+
+    # Fresh interpreters for the workers rather than forking a process that already runs threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(detector_workers(), mp_context=context, initializer=_load_detector) as pool:
+        # Start a worker and load the HOG model before the first frame needs it
+        pool.submit(_detect, np.zeros((8, 8), dtype=np.uint8)).result()
+        stations = [Station(config, pool, lookup, metrics) for config in STATIONS]
+        for station in stations:
+            station.start()
+
+        print("Press 'R' to reset every station, '1'-'9' to reset one. Press 'Q' to quit.")
+        try:
+            while not all(station.done.is_set() for station in stations):
+                if HEADLESS:
+                    time.sleep(0.1)
+                    continue
+
+                for station in stations:
+                    latest = station.take_latest()
+                    if latest is not None:
+                        with metrics.time("display"):
+                            draw_station(station, *latest)
+
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord("q"):
+                    break
+                elif key == ord("r"):
+                    for station in stations:
+                        station.request_reset()
+                elif ord("1") <= key <= ord("9") and key - ord("1") < len(stations):
+                    stations[key - ord("1")].request_reset()
+        except KeyboardInterrupt:
+            pass
+
+        for station in stations:
+            station.stop()
+            print(station.format_stats())
+
+    print(metrics.format_summary())
+    print(f"[METRICS] Slowest stage: {metrics.bottleneck()}")
+    metrics.close()
+    if not HEADLESS:
+        cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    main()
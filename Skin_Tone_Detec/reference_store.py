@@ -0,0 +1,82 @@
+import os
+import json
+import numpy as np
+from skin_tone_classifier import SkinToneClassifier, file_sha256
+
+# Bump when the layout of the .npy store or its sidecar changes
+STORE_VERSION = 1
+
+# The store is a (4, N) uint8 .npy matrix whose rows are the R, G, B and label
+# columns, plus a JSON sidecar with the tone names and the hash of the source CSV.
+def store_paths(csv_path):
+    base = os.path.splitext(csv_path)[0]
+    return base + ".npy", base + ".json"
+
+def write_reference_store(csv_path, classifier=None, csv_hash=None):
+    """Write the binary store next to the CSV it was built from."""
+    classifier = classifier or SkinToneClassifier.from_csv(csv_path)
+    store_path, meta_path = store_paths(csv_path)
+
+    columns = np.empty((4, len(classifier.labels)), dtype=np.uint8)
+    columns[:3] = classifier.rgb.T
+    columns[3] = classifier.labels
+    metadata = {
+        "version": STORE_VERSION,
+        "tones": classifier.tones,
+        "rows": int(columns.shape[1]),
+        "source_sha256": csv_hash or file_sha256(csv_path),
+    }
+
+    # Data first, sidecar last: a store without a matching sidecar is never used
+    with open(store_path + ".tmp", "wb") as file:
+        np.save(file, columns)
+    os.replace(store_path + ".tmp", store_path)
+    with open(meta_path + ".tmp", "w") as file:
+        json.dump(metadata, file)
+    os.replace(meta_path + ".tmp", meta_path)
+    print(f"Reference store saved to {store_path}")
+    return store_path
+
+def read_reference_store(csv_path, csv_hash=None):
+    """Memory-map the store for this CSV, or return None if it is missing or stale."""
+    store_path, meta_path = store_paths(csv_path)
+    try:
+        with open(meta_path, "r") as file:
+            metadata = json.load(file)
+        columns = np.load(store_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    if metadata.get("version") != STORE_VERSION or columns.shape != (4, metadata["rows"]):
+        return None
+    # Without the CSV (e.g. only the store was deployed) the store is the reference
+    if os.path.exists(csv_path):
+        if (csv_hash or file_sha256(csv_path)) != metadata["source_sha256"]:
+            return None
+    return metadata["tones"], columns
+
+def reference_sha256(csv_path):
+    """Hash identifying the reference data: the CSV's, or the one recorded by its store."""
+    if os.path.exists(csv_path):
+        return file_sha256(csv_path)
+    with open(store_paths(csv_path)[1], "r") as file:
+        return json.load(file)["source_sha256"]
+
+def load_skin_tone_classifier(csv_path, csv_hash=None):
+    """Classifier from the binary store, falling back to parsing the CSV.
+
+    After a fallback the store is written next to the CSV, so later launches
+    memory-map it instead of parsing the CSV again.
+    """
+    store = read_reference_store(csv_path, csv_hash)
+    if store is None:
+        print(f"[INFO] No up-to-date reference store for {csv_path}, parsing CSV...")
+        classifier = SkinToneClassifier.from_csv(csv_path)
+        try:
+            write_reference_store(csv_path, classifier, csv_hash)
+        except OSError as e:
+            # Read-only install: keep working from the CSV
+            print(f"[WARN] Could not save reference store for {csv_path}: {e}")
+        return classifier
+    tones, columns = store
+    return SkinToneClassifier(tones, columns[:3].T, columns[3])
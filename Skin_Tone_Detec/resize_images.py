@@ -1,46 +1,116 @@
 import cv2
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from image_headers import read_image_header
 
 # Path to the dataset folder
 DATASET_PATH = "/home/chroma/Desktop/Face Recognition/dataset"
 
+# Write resized copies into this tree (same monk_*/<subject>/ layout) instead of
+# overwriting the originals; None resizes in place
+OUTPUT_PATH = None
+
 # Desired image size
 IMG_SIZE = (400, 400)
 
-def resize_images():
+# Resize processes; None uses every core
+WORKERS = None
+
+def already_sized(path):
+    """ True if the file header says the image is already IMG_SIZE; nothing is decoded. """
+    try:
+        header = read_image_header(path)
+    except OSError:
+        return False
+    return header is not None and header[1:] == IMG_SIZE
+
+def resize_image(img_path, out_path):
+    """ Resize one image into out_path; returns "resized", "copied" or "skipped". """
+    if out_path == img_path:
+        if already_sized(img_path):
+            return "skipped"
+    elif os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(img_path) \
+            and already_sized(out_path):
+        return "skipped"
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    # Temporary file in the destination folder; its extension selects the encoder
+    root, ext = os.path.splitext(out_path)
+    tmp_path = os.path.join(os.path.dirname(root), "." + os.path.basename(root) + ".tmp" + ext)
+    try:
+        if already_sized(img_path):
+            # Right size already: copy the bytes rather than recompressing them
+            shutil.copy2(img_path, tmp_path)
+            action = "copied"
+        else:
+            # Read the image
+            img = cv2.imread(img_path)
+            if img is None:
+                raise ValueError("could not decode image")
+
+            # Resize the image to 400x400
+            resized_img = cv2.resize(img, IMG_SIZE)
+            if not cv2.imwrite(tmp_path, resized_img):
+                raise ValueError("could not encode image")
+            action = "resized"
+        # Readers see either the old file or the complete new one, never a partial write
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return action
+
+def _resize_worker(paths):
+    img_path, out_path = paths
+    try:
+        return img_path, resize_image(img_path, out_path), None
+    except Exception as e:
+        return img_path, None, str(e)
+
+def dataset_jobs(dataset_path=DATASET_PATH, output_path=OUTPUT_PATH):
+    """ (image path, destination path) for every image under monk_*/<subject>/. """
+    jobs = []
     # Iterate through monk_1 to monk_10
-    for monk_folder in sorted(os.listdir(DATASET_PATH)):
-        monk_path = os.path.join(DATASET_PATH, monk_folder)
+    for monk_folder in sorted(os.listdir(dataset_path)):
+        monk_path = os.path.join(dataset_path, monk_folder)
 
         # Ensure it's a directory
-        if os.path.isdir(monk_path):
-            print(f"Resizing images in {monk_folder}...")
-
-            # Iterate through subject folders
-            for subject_folder in os.listdir(monk_path):
-                subject_path = os.path.join(monk_path, subject_folder)
+        if not os.path.isdir(monk_path):
+            continue
 
-                if os.path.isdir(subject_path):
-                    # Iterate through all images in subject folder
-                    for img_name in os.listdir(subject_path):
-                        img_path = os.path.join(subject_path, img_name)
+        # Iterate through subject folders
+        for subject_folder in sorted(os.listdir(monk_path)):
+            subject_path = os.path.join(monk_path, subject_folder)
 
-                        # Check if the file is an image
-                        if img_name.lower().endswith((".jpg", ".jpeg", ".png")):
-                            try:
-                                # Read the image
-                                img = cv2.imread(img_path)
+            if not os.path.isdir(subject_path):
+                continue
 
-                                # Resize the image to 400x400
-                                resized_img = cv2.resize(img, IMG_SIZE)
+            for img_name in sorted(os.listdir(subject_path)):
+                # Check if the file is an image (hidden names are our own temporary files)
+                if img_name.startswith(".") or not img_name.lower().endswith((".jpg", ".jpeg", ".png")):
+                    continue
+                img_path = os.path.join(subject_path, img_name)
+                out_path = os.path.join(output_path, monk_folder, subject_folder, img_name) if output_path else img_path
+                jobs.append((img_path, out_path))
+    return jobs
 
-                                # Overwrite the original image
-                                cv2.imwrite(img_path, resized_img)
+def resize_images(dataset_path=DATASET_PATH, output_path=OUTPUT_PATH, workers=WORKERS):
+    jobs = dataset_jobs(dataset_path, output_path)
+    print(f"Resizing {len(jobs)} images in {dataset_path}"
+          + (f" into {output_path}..." if output_path else " in place..."))
 
-                            except Exception as e:
-                                print(f"Error processing {img_name}: {e}")
+    counts = {"resized": 0, "copied": 0, "skipped": 0, "failed": 0}
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for img_path, action, error in pool.map(_resize_worker, jobs, chunksize=max(1, len(jobs) // (4 * workers))):
+            if error is None:
+                counts[action] += 1
+            else:
+                counts["failed"] += 1
+                print(f"Error processing {img_path}: {error}")
 
-    print("All images have been resized to 400x400 pixels.")
+    print(f"Resizing to {IMG_SIZE[0]}x{IMG_SIZE[1]} pixels complete: {counts}")
 
 if __name__ == "__main__":
     resize_images()
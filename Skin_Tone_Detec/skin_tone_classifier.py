@@ -0,0 +1,88 @@
+import csv
+import hashlib
+import numpy as np
+
+# Load Monk Skin Tone Reference Data
+def load_monk_skin_tones(csv_path):
+    skin_tones = {}
+    with open(csv_path, "r") as file:
+        reader = csv.reader(file)
+        next(reader)  # Skip header
+        for row in reader:
+            tone = row[0]
+            rgb = (int(row[1]), int(row[2]), int(row[3]))
+            skin_tones.setdefault(tone, []).append(rgb)
+    return skin_tones
+
+# Get average RGB from forehead region
+def get_average_face_rgb(frame, face_location):
+    """Extract and compute the average RGB value from the forehead region."""
+    (top, right, bottom, left) = face_location
+    face_roi = frame[top:bottom, left:right]
+
+    # Focus only on the forehead
+    h, w, _ = face_roi.shape
+    forehead_roi = face_roi[:int(h * 0.4), :]
+
+    avg_r = int(np.mean(forehead_roi[:, :, 0]))
+    avg_g = int(np.mean(forehead_roi[:, :, 1]))
+    avg_b = int(np.mean(forehead_roi[:, :, 2]))
+
+    return (avg_r, avg_g, avg_b)
+
+def file_sha256(path):
+    """Hex digest of a file's contents, used to key caches built from the reference CSV."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SkinToneClassifier:
+    """Nearest-neighbour Monk Skin Tone classifier over a fixed reference set.
+
+    The reference samples are held as one contiguous (N, 3) int32 matrix with a
+    parallel label index array, so a query is a single vectorized distance
+    computation instead of a Python loop over every CSV row.
+    """
+
+    def __init__(self, tones, rgb, labels):
+        self.tones = list(tones)                                   # label index -> tone name
+        self.rgb = np.ascontiguousarray(rgb, dtype=np.int32)      # (N, 3) reference samples
+        self.labels = np.ascontiguousarray(labels, dtype=np.intp) # (N,) index into self.tones
+
+    @classmethod
+    def from_reference(cls, reference_rgb):
+        """Build from the {tone: [(r, g, b), ...]} dict returned by load_monk_skin_tones."""
+        tones, rgb, labels = [], [], []
+        # Keep the same tone-grouped order the old per-sample loop walked, so ties
+        # resolve to the same sample as before (argmin returns the first minimum).
+        for index, (tone, samples) in enumerate(reference_rgb.items()):
+            tones.append(tone)
+            rgb.extend(samples)
+            labels.extend([index] * len(samples))
+        return cls(tones, np.array(rgb, dtype=np.int32).reshape(-1, 3), labels)
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        return cls.from_reference(load_monk_skin_tones(csv_path))
+
+    def nearest_indices(self, face_rgbs):
+        """Index of the closest reference sample for each (r, g, b) row."""
+        queries = np.asarray(face_rgbs, dtype=np.int32).reshape(-1, 1, 3)
+        diff = queries - self.rgb
+        # Squared integer distances are exact and order-preserving, so no sqrt needed
+        dist = np.einsum("qnc,qnc->qn", diff, diff)
+        return np.argmin(dist, axis=1)
+
+    def classify(self, face_rgb):
+        """Closest Monk Skin Tone for a single (r, g, b) value."""
+        index = self.nearest_indices([face_rgb])[0]
+        return self.tones[self.labels[index]]
+
+    def classify_batch(self, face_rgbs):
+        """Closest Monk Skin Tone for every (r, g, b) row, in one distance computation."""
+        if len(face_rgbs) == 0:
+            return []
+        indices = self.nearest_indices(face_rgbs)
+        return [self.tones[label] for label in self.labels[indices]]
@@ -0,0 +1,154 @@
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Latest samples per stage kept for the rolling percentiles
+WINDOW = 500
+
+# Upper bounds (ms) of the histogram buckets reported per stage
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+class RollingHistogram:
+    """Durations of the last `window` runs of one stage."""
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.total = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.total += 1
+
+    def snapshot(self):
+        ms = np.array(self.samples) * 1000
+        if not len(ms):
+            return {"total": self.total, "window": 0}
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        counts = np.histogram(ms, bins=(0,) + BUCKETS_MS + (np.inf,))[0]
+        labels = [f"<={bound}ms" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {
+            "total": self.total,
+            "window": len(ms),
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(ms.max()), 3),
+            "buckets": dict(zip(labels, counts.tolist())),
+        }
+
+class StageMetrics:
+    """Thread-safe per-stage latency histograms for the live detectors.
+
+    Wrap a stage in `with metrics.time("detection"):`. Snapshots can be served
+    over HTTP, published to MQTT and appended to a JSON-lines log file.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stop_event = threading.Event()
+        self.http_server = None
+
+    def record(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = RollingHistogram(self.window)
+            histogram.add(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self.lock:
+            stages = {stage: histogram.snapshot() for stage, histogram in self.histograms.items()}
+        return {"timestamp": time.time(), "uptime_s": round(time.time() - self.started, 1), "stages": stages}
+
+    def bottleneck(self):
+        """Stage with the highest mean latency in the current window."""
+        stages = self.snapshot()["stages"]
+        timed = {stage: stats["mean_ms"] for stage, stats in stages.items() if stats.get("window")}
+        return max(timed, key=timed.get) if timed else None
+
+    def serve_http(self, port, host="127.0.0.1"):
+        """Serve the snapshot as JSON at http://host:port/metrics."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.http_server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.http_server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"[METRICS] Serving http://{host}:{self.http_server.server_address[1]}/metrics")
+
+    def start_reporting(self, interval, log_path=None, mqtt_broker=None, mqtt_topic=None, mqtt_port=1883):
+        """Every `interval` seconds append the snapshot to `log_path` and/or publish it to MQTT."""
+        client = None
+        if mqtt_broker and mqtt_topic:
+            import paho.mqtt.client as mqtt
+
+            client = mqtt.Client()
+            client.connect_async(mqtt_broker, mqtt_port, 60)
+            client.loop_start()
+
+        def report():
+            while not self.stop_event.wait(interval):
+                payload = json.dumps(self.snapshot())
+                if log_path:
+                    with open(log_path, "a") as file:
+                        file.write(payload + "\n")
+                if client:
+                    client.publish(mqtt_topic, payload)
+            if client:
+                client.loop_stop()
+                client.disconnect()
+
+        if log_path or client:
+            threading.Thread(target=report, name="metrics-report", daemon=True).start()
+
+    def format_summary(self):
+        lines = ["[METRICS] stage               p50 ms    p95 ms    p99 ms"]
+        for stage, stats in self.snapshot()["stages"].items():
+            if stats.get("window"):
+                lines.append(f"[METRICS] {stage:16s} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}")
+        return "\n".join(lines)
+
+    def close(self):
+        self.stop_event.set()
+        if self.http_server:
+            self.http_server.shutdown()
+
+class NullMetrics:
+    """Stand-in used when instrumentation is off; timing a stage costs nothing."""
+
+    def time(self, stage):
+        return nullcontext()
+
+    def record(self, stage, seconds):
+        pass
+
+NO_METRICS = NullMetrics()
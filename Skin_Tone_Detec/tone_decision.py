@@ -0,0 +1,66 @@
+from tone_vote import SequentialVote, MAX_SAMPLES, MIN_SAMPLES, CONFIDENCE
+from stage_metrics import NO_METRICS
+
+# Mapping monk tones to buckets
+bucket_mapping = {
+    "monk_1": "Bucket1", "monk_2": "Bucket1",
+    "monk_3": "Bucket2", "monk_4": "Bucket2",
+    "monk_5": "Bucket3", "monk_6": "Bucket3",
+    "monk_7": "Bucket4", "monk_8": "Bucket4",
+    "monk_9": "Bucket5", "monk_10": "Bucket5",
+}
+
+# Preset mapping for the lightboxes (same on every box)
+bucket_to_preset_id = {
+    "Bucket1": 1,
+    "Bucket2": 2,
+    "Bucket3": 3,
+    "Bucket4": 4,
+    "Bucket5": 5,
+}
+
+# Boot state sent to the lightboxes when sampling is reset
+RESET_PRESET = 6
+
+class ToneDecision:
+    """Votes on sampled tones and sends the decided bucket's preset to the lightboxes.
+
+    Shared by face_recog_3.0.py and every station of multi_station.py. After a
+    decision, sampling stops until `reset()`.
+    """
+
+    def __init__(self, wled, max_samples=MAX_SAMPLES, min_samples=MIN_SAMPLES, confidence=CONFIDENCE,
+                 metrics=NO_METRICS, name=None):
+        self.wled = wled
+        self.vote = SequentialVote(max_samples=max_samples, min_samples=min_samples, confidence=confidence)
+        self.metrics = metrics
+        self.prefix = f"[{name}] " if name else ""  # Station name in front of every log line
+        self.sampling_active = True
+
+    def reset(self):
+        self.vote.reset()
+        self.sampling_active = True
+        print(f"{self.prefix}Sampling reset.")
+        self.wled.send_preset(RESET_PRESET)
+
+    def sample(self, tone, avg_rgb):
+        """Add one classified face; returns the decided tone once the vote settles, else None."""
+        if not self.sampling_active:
+            return None
+        decided_tone = self.vote.add(tone)
+        print(f"{self.prefix}Sample {self.vote.samples}: {avg_rgb} -> {tone}")
+        if not decided_tone:
+            return None
+
+        print(f"{self.prefix}{self.vote.format_decision()}")
+        preset_id = bucket_to_preset_id.get(bucket_mapping.get(decided_tone, "Unknown"))
+        if preset_id:
+            with self.metrics.time("dispatch"):
+                self.wled.send_preset(preset_id)
+        else:
+            print(f"{self.prefix}[HTTP] Unknown bucket mapping for: {decided_tone}")
+        self.sampling_active = False
+        return decided_tone
+
+    def format_stats(self):
+        return self.vote.format_stats()
@@ -0,0 +1,175 @@
+import os
+import sys
+import glob
+import numpy as np
+from skin_tone_classifier import file_sha256
+from reference_store import load_skin_tone_classifier, reference_sha256
+
+# Bits kept per colour channel. 8 gives the dense 256^3 table (~16 MB),
+# lower values give a coarser 2^(3*bits) table.
+DEFAULT_BITS = 8
+
+# Table value for cells whose colours do not all share one nearest tone;
+# those queries fall back to the exact classifier.
+AMBIGUOUS = 255
+
+# Cells checked against the full reference set in one go while building. Each
+# chunk makes a few (CHUNK_CELLS, reference rows) float64 temporaries, ~12 MB
+# apiece for ~6k rows, so the build stays small enough to run at startup on a Pi
+CHUNK_CELLS = 256
+
+def _cell_centers(bits):
+    """Per-axis cell centre coordinates and the cell's centre-to-corner radius."""
+    size = 256 >> bits
+    centers = np.arange(1 << bits) * size + (size - 1) / 2.0
+    radius = np.sqrt(3.0) * (size - 1) / 2.0
+    return centers, radius
+
+def _grid(axis_values):
+    r, g, b = np.meshgrid(axis_values, axis_values, axis_values, indexing="ij")
+    return np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+
+def _label_minimums(points, ref_rgb, group_starts):
+    """Squared distance from each point to the closest sample of every label."""
+    d2 = (points ** 2).sum(axis=1)[:, None] - 2.0 * points @ ref_rgb.T + (ref_rgb ** 2).sum(axis=1)
+    return np.minimum.reduceat(d2, group_starts, axis=1)
+
+def _resolve(label_mins, group_labels, radius):
+    """Label per cell, or AMBIGUOUS unless every colour in the cell shares that nearest label.
+
+    Any colour within `radius` of the centre moves at most `radius` closer to or
+    further from each sample, so a gap of more than 2 * radius between the best
+    label and the runner-up guarantees the whole cell agrees.
+    """
+    if label_mins.shape[1] == 1:
+        return np.full(len(label_mins), group_labels[0], dtype=np.uint8), np.zeros(len(label_mins))
+    order = np.argsort(label_mins, axis=1)[:, :2]
+    rows = np.arange(len(label_mins))
+    best = np.sqrt(np.maximum(label_mins[rows, order[:, 0]], 0.0))
+    runner_up = np.sqrt(np.maximum(label_mins[rows, order[:, 1]], 0.0))
+    result = group_labels[order[:, 0]].astype(np.uint8)
+    result[runner_up - best <= 2.0 * radius + 1e-6] = AMBIGUOUS
+    return result, best
+
+def build_lookup_table(classifier, bits=DEFAULT_BITS):
+    """Dense (2^bits)^3 uint8 table of label indices into classifier.tones.
+
+    Built coarse-to-fine: cells of a 32^3 grid that resolve to a single tone are
+    filled directly, and only the remaining cells are refined against the few
+    reference samples that could still be nearest to them.
+    """
+    if len(classifier.tones) >= AMBIGUOUS:
+        raise ValueError(f"Too many tones for a uint8 table: {len(classifier.tones)}")
+
+    order = np.argsort(classifier.labels, kind="stable")
+    ref_rgb = classifier.rgb[order].astype(np.float64)
+    ref_labels = classifier.labels[order]
+    group_starts = np.flatnonzero(np.r_[True, ref_labels[1:] != ref_labels[:-1]])
+    group_labels = ref_labels[group_starts]
+
+    coarse_bits = min(bits, 5)
+    coarse_centers, coarse_radius = _cell_centers(coarse_bits)
+    coarse_points = _grid(coarse_centers)
+    coarse = np.empty(len(coarse_points), dtype=np.uint8)
+    coarse_best = np.empty(len(coarse_points))
+    for start in range(0, len(coarse_points), CHUNK_CELLS):
+        chunk = slice(start, start + CHUNK_CELLS)
+        label_mins = _label_minimums(coarse_points[chunk], ref_rgb, group_starts)
+        coarse[chunk], coarse_best[chunk] = _resolve(label_mins, group_labels, coarse_radius)
+
+    side = 1 << bits
+    step = 1 << (bits - coarse_bits)
+    fine_centers, fine_radius = _cell_centers(bits)
+    table = np.repeat(np.repeat(np.repeat(
+        coarse.reshape((1 << coarse_bits,) * 3), step, axis=0), step, axis=1), step, axis=2)
+    if step == 1:
+        return table
+
+    # Refine each unresolved coarse cell: only samples within best + 2 * radius of
+    # its centre can be nearest to any colour inside it.
+    for cell in np.flatnonzero(coarse == AMBIGUOUS):
+        center = coarse_points[cell]
+        reach = coarse_best[cell] + 2.0 * coarse_radius + 1e-6
+        candidates = np.flatnonzero(((ref_rgb - center) ** 2).sum(axis=1) <= reach * reach)
+        cand_labels = ref_labels[candidates]
+        cand_starts = np.flatnonzero(np.r_[True, cand_labels[1:] != cand_labels[:-1]])
+
+        qr, qg, qb = np.unravel_index(cell, (1 << coarse_bits,) * 3)
+        r0, g0, b0 = qr * step, qg * step, qb * step
+        axis = np.arange(step)
+        fine_points = np.stack(np.meshgrid(
+            fine_centers[r0 + axis], fine_centers[g0 + axis], fine_centers[b0 + axis], indexing="ij"
+        ), axis=-1).reshape(-1, 3)
+        label_mins = _label_minimums(fine_points, ref_rgb[candidates], cand_starts)
+        fine, _ = _resolve(label_mins, cand_labels[cand_starts], fine_radius)
+        table[r0:r0 + step, g0:g0 + step, b0:b0 + step] = fine.reshape(step, step, step)
+
+    assert table.shape == (side, side, side)
+    return table
+
+def table_path(csv_path, bits=DEFAULT_BITS, cache_dir=None, csv_hash=None):
+    """Cache file for the table built from this exact CSV content."""
+    csv_hash = csv_hash or file_sha256(csv_path)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    directory = cache_dir or os.path.dirname(os.path.abspath(csv_path))
+    return os.path.join(directory, f"{stem}.{csv_hash[:16]}.lut{bits}.npy")
+
+class ToneLookupTable:
+    """RGB -> Monk Skin Tone lookup backed by a memory-mapped table.
+
+    Classification is a single array index; the rare ambiguous cells are
+    answered by the exact nearest-neighbour classifier.
+    """
+
+    def __init__(self, table, classifier):
+        self.table = table
+        self.classifier = classifier
+        self.shift = 8 - (table.shape[0].bit_length() - 1)
+
+    @classmethod
+    def load_or_build(cls, csv_path, bits=DEFAULT_BITS, cache_dir=None, classifier=None):
+        """Memory-map the cached table for this CSV, building it first if the CSV changed.
+
+        If the table cannot be saved (read-only install) the built table is used from memory.
+        """
+        csv_hash = reference_sha256(csv_path)
+        classifier = classifier or load_skin_tone_classifier(csv_path, csv_hash)
+        path = table_path(csv_path, bits, cache_dir, csv_hash)
+        if not os.path.exists(path):
+            print(f"[LUT] Building {bits}-bit lookup table for {csv_path}...")
+            table = build_lookup_table(classifier, bits)
+            try:
+                _remove_stale_tables(path, bits)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as file:
+                    np.save(file, table)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                # Read-only install: use the table from memory (rebuilt on every start)
+                print(f"[WARN] Could not save lookup table to {path}: {e}")
+                return cls(table, classifier)
+            print(f"[LUT] Saved lookup table to {path}")
+        return cls(np.load(path, mmap_mode="r"), classifier)
+
+    def classify(self, face_rgb):
+        r, g, b = (int(value) >> self.shift for value in face_rgb)
+        label = self.table[r, g, b]
+        if label == AMBIGUOUS:
+            return self.classifier.classify(face_rgb)
+        return self.classifier.tones[label]
+
+def _remove_stale_tables(path, bits):
+    """Drop tables cached for older versions of the same CSV."""
+    stem = os.path.basename(path).split(".")[0]
+    pattern = os.path.join(os.path.dirname(path), f"{stem}.*.lut{bits}.npy")
+    for stale in glob.glob(pattern):
+        if stale != path:
+            os.remove(stale)
+
+if __name__ == "__main__":
+    # Usage: python tone_lookup.py [monk_skin_tones.csv] [bits]
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "monk_skin_tones.csv"
+    bits = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BITS
+    lookup = ToneLookupTable.load_or_build(csv_path, bits)
+    ambiguous = np.count_nonzero(np.asarray(lookup.table) == AMBIGUOUS)
+    print(f"[LUT] {lookup.table.size} cells, {ambiguous} fall back to the exact classifier.")
@@ -0,0 +1,72 @@
+import time
+from collections import Counter
+
+# Hard cap: decide by plain majority once this many samples are in
+MAX_SAMPLES = 7
+
+# Commit early once the leading tone holds this share of at least MIN_SAMPLES samples
+MIN_SAMPLES = 3
+CONFIDENCE = 0.8
+
+class SequentialVote:
+    """Streaming majority vote over classified samples that stops as early as it safely can.
+
+    `add()` returns the decided tone as soon as one of these holds, else None:
+      - the leader is ahead by more than the samples left before MAX_SAMPLES,
+        so it cannot be overtaken ("decided")
+      - at least `min_samples` are in and the leader's share reaches
+        `confidence` ("confident")
+      - `max_samples` samples are in; plain majority ("cap")
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES, min_samples=MIN_SAMPLES, confidence=CONFIDENCE):
+        self.max_samples = max_samples
+        self.min_samples = min(min_samples, max_samples)
+        self.confidence = confidence
+        self.history = []  # (tone, samples, seconds, reason) of every decision made
+        self.reset()
+
+    def reset(self):
+        self.counts = Counter()
+        self.samples = 0
+        self.started = None
+        self.decision = None
+
+    def add(self, tone):
+        if self.decision is not None:
+            return self.decision
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.counts[tone] += 1
+        self.samples += 1
+
+        ranked = self.counts.most_common(2)
+        leader, leader_count = ranked[0]
+        runner_up_count = ranked[1][1] if len(ranked) > 1 else 0
+        remaining = self.max_samples - self.samples
+
+        if self.samples >= self.max_samples:
+            reason = "cap"
+        elif leader_count - runner_up_count > remaining:
+            reason = "decided"
+        elif self.samples >= self.min_samples and leader_count / self.samples >= self.confidence:
+            reason = "confident"
+        else:
+            return None
+
+        self.decision = leader
+        self.history.append((leader, self.samples, time.perf_counter() - self.started, reason))
+        return leader
+
+    def format_decision(self):
+        tone, samples, seconds, reason = self.history[-1]
+        return f"[VOTE] {tone} after {samples} samples in {seconds:.2f} s ({reason})"
+
+    def format_stats(self):
+        if not self.history:
+            return "[VOTE] no decisions"
+        samples = sum(entry[1] for entry in self.history) / len(self.history)
+        seconds = sum(entry[2] for entry in self.history) / len(self.history)
+        reasons = Counter(entry[3] for entry in self.history)
+        return (f"[VOTE] {len(self.history)} decisions, avg {samples:.1f} samples / "
+                f"{seconds:.2f} s to decide, {dict(reasons)}")
@@ -0,0 +1,201 @@
+import time
+import threading
+import requests
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+REQUEST_TIMEOUT = 2  # seconds
+RESYNC_INTERVAL = 10  # seconds between retries for devices that missed an update
+
+# Outcome of one preset request to one lightbox; error is None on success
+DispatchResult = namedtuple("DispatchResult", ["ip", "preset_id", "status_code", "elapsed", "error"])
+
+def print_result(result):
+    if result.error is None:
+        print(f"[HTTP] Sent preset {result.preset_id} to {result.ip} "
+              f"(Status {result.status_code}, {result.elapsed * 1000:.0f} ms)")
+    else:
+        print(f"[HTTP] Error sending to {result.ip}: {result.error}")
+
+class DeviceState:
+    """What we believe one lightbox is showing and what it should be showing."""
+
+    def __init__(self, ip):
+        self.ip = ip
+        self.acked_preset = None    # last preset the device confirmed, None if unknown
+        self.desired_preset = None  # latest preset requested for the device
+        self.in_flight = False      # a worker is currently sending to this device
+        self.last_error = None
+
+    def in_sync(self):
+        return self.desired_preset is None or self.desired_preset == self.acked_preset
+
+class WledDispatcher:
+    """Keeps every lightbox on the latest requested preset without blocking the caller.
+
+    Each device has its own keep-alive session and a single worker thread, so a
+    slow or offline box only delays itself. Requests for a preset the device
+    already acknowledged are skipped, bursts collapse to the latest request
+    while a send is in flight, and devices that missed an update are re-sent
+    every `resync_interval` seconds.
+    """
+
+    def __init__(self, ips, timeout=REQUEST_TIMEOUT, on_result=print_result, resync_interval=RESYNC_INTERVAL):
+        self.ips = list(ips)
+        self.timeout = timeout
+        self.on_result = on_result
+        self.lock = threading.Lock()
+        self.devices = {ip: DeviceState(ip) for ip in self.ips}
+        self.stats = {"requested": 0, "sent": 0, "failed": 0, "skipped": 0, "coalesced": 0, "resynced": 0}
+        self.sessions = {}
+        self.executors = {}
+        for ip in self.ips:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self.sessions[ip] = session
+            self.executors[ip] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"wled-{ip}")
+
+        self.closed = threading.Event()
+        if resync_interval:
+            threading.Thread(target=self._resync_loop, args=(resync_interval,), name="wled-resync", daemon=True).start()
+
+    def _send(self, ip, preset_id):
+        start = time.perf_counter()
+        try:
+            response = self.sessions[ip].get(f"http://{ip}/win&PL={preset_id}", timeout=self.timeout)
+            response.raise_for_status()
+            result = DispatchResult(ip, preset_id, response.status_code, time.perf_counter() - start, None)
+        except Exception as e:
+            result = DispatchResult(ip, preset_id, None, time.perf_counter() - start, e)
+        if self.on_result:
+            self.on_result(result)
+        return result
+
+    def _drain(self, ip):
+        """Worker loop for one device: send until it has acknowledged the latest preset."""
+        device = self.devices[ip]
+        while not self.closed.is_set():
+            with self.lock:
+                if device.in_sync():
+                    device.in_flight = False
+                    return
+                preset_id = device.desired_preset
+
+            result = self._send(ip, preset_id)
+
+            with self.lock:
+                if result.error is None:
+                    device.acked_preset = preset_id
+                    device.last_error = None
+                    self.stats["sent"] += 1
+                else:
+                    # Unknown state now; leave it for the resync loop instead of hammering a dead box
+                    device.acked_preset = None
+                    device.last_error = result.error
+                    device.in_flight = False
+                    self.stats["failed"] += 1
+                    return
+        with self.lock:
+            device.in_flight = False
+
+    def _schedule(self, device):
+        """Start a worker for `device` unless one is running; caller holds the lock."""
+        if device.in_flight:
+            self.stats["coalesced"] += 1
+            return "coalesced"
+        if device.in_sync():
+            self.stats["skipped"] += 1
+            return "skipped"
+        device.in_flight = True
+        self.executors[device.ip].submit(self._drain, device.ip)
+        return "queued"
+
+    def send_preset(self, preset_id):
+        """Request `preset_id` on every device; returns {ip: "queued" | "coalesced" | "skipped"}."""
+        with self.lock:
+            self.stats["requested"] += 1
+            actions = {}
+            for ip, device in self.devices.items():
+                device.desired_preset = preset_id
+                actions[ip] = self._schedule(device)
+            return actions
+
+    def resync(self):
+        """Re-send the desired preset to every idle device that has not acknowledged it."""
+        with self.lock:
+            for device in self.devices.values():
+                if not device.in_flight and not device.in_sync():
+                    self.stats["resynced"] += 1
+                    self._schedule(device)
+
+    def forget(self, ip=None):
+        """Drop the cached state (e.g. after a box was power-cycled) so the next request is sent."""
+        with self.lock:
+            for device in self.devices.values():
+                if ip is None or device.ip == ip:
+                    device.acked_preset = None
+
+    def _resync_loop(self, interval):
+        while not self.closed.wait(interval):
+            self.resync()
+
+    def wait_idle(self, timeout=None):
+        """Block until no device has a send in flight; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(device.in_flight for device in self.devices.values()):
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def format_stats(self):
+        out_of_sync = [ip for ip, device in self.devices.items() if not device.in_sync()]
+        return f"[HTTP] {self.stats}, out of sync: {out_of_sync or 'none'}"
+
+    def close(self, wait=False):
+        self.closed.set()
+        for executor in self.executors.values():
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+        for session in self.sessions.values():
+            session.close()
+
+def start_stand_in(port, delay=0.0, host="127.0.0.1"):
+    """Local HTTP server that answers WLED preset requests after `delay` seconds."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like WLED
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    # Dispatch against local stand-ins: one fast box, one slow box and one offline address
+    servers = [start_stand_in(8081, 0.0), start_stand_in(8082, 1.0)]
+    dispatcher = WledDispatcher(["127.0.0.1:8081", "127.0.0.1:8082", "127.0.0.1:9"], timeout=2, resync_interval=1)
+
+    start = time.perf_counter()
+    # A burst of R presses and decisions collapses to a single send of the latest preset
+    for preset_id in (6, 6, 6, 3, 6, 4):
+        actions = dispatcher.send_preset(preset_id)
+        print(f"send_preset({preset_id}) -> {actions} after {(time.perf_counter() - start) * 1000:.1f} ms")
+    dispatcher.wait_idle()
+    print(dispatcher.send_preset(4))  # already showing 4: skipped everywhere but the offline box
+    print(f"Settled after {time.perf_counter() - start:.2f} s")
+    time.sleep(1.5)  # let the resync loop retry the offline box once
+    print(dispatcher.format_stats())
+
+    dispatcher.close()
+    for server in servers:
+        server.shutdown()
@@ -1,63 +1,274 @@
 from umqtt.simple import MQTTClient
-from machine import Pin
+from machine import Pin, PWM
+import json
 import time
 
 # MQTT broker details (Raspberry Pi)
 MQTT_BROKER = "192.168.1.38"
 MQTT_TOPIC = "led/control"
+PRESET_TOPIC = "wled/main/api"  # face_recog_2.0.py publishes the decided bucket ("Bucket1".."Bucket5") here
+STATUS_TOPIC = "led/status"  # Every handled command is reported here (scenes echo their sid/seq)
+
+# Poll quickly right after a message and back off towards POLL_MAX_MS while idle,
+# so a command waits at most POLL_MAX_MS instead of a fixed second
+POLL_MIN_MS = 2
+POLL_MAX_MS = 50
+
+# Ping the broker this often so idle connections are not dropped (seconds)
+KEEPALIVE = 60
+PING_EVERY_MS = KEEPALIVE * 1000 // 2
+
+# Reconnect attempts wait RECONNECT_MIN_MS, doubling up to RECONNECT_MAX_MS while the broker stays down
+RECONNECT_MIN_MS = 1000
+RECONNECT_MAX_MS = 30000
+
+# LED channels are driven by PWM; duty runs from 0 (off) to DUTY_MAX (full brightness)
+PWM_FREQ = 1000
+DUTY_MAX = 1023
+
+# Scene messages carry a 16-bit sequence number that wraps around
+SEQ_MOD = 1 << 16
+
+# Preset changes fade over FADE_MS unless the message sets its own "fade";
+# the duty is updated every FADE_STEP_MS while a fade runs
+FADE_MS = 800
+FADE_STEP_MS = 10
+
+# Channel duties per preset, matching the Monk tone buckets in face_recog_2.0.py
+# (Bucket1 = monk_1/2 ... Bucket5 = monk_9/10). Starting points; tune on the lightbox.
+PRESETS = {
+    "Bucket1": {"RED": 0, "GREEN": 0, "BLUE": 80, "WHITE": 450},
+    "Bucket2": {"RED": 60, "GREEN": 0, "BLUE": 40, "WHITE": 600},
+    "Bucket3": {"RED": 120, "GREEN": 40, "BLUE": 0, "WHITE": 750},
+    "Bucket4": {"RED": 200, "GREEN": 80, "BLUE": 0, "WHITE": 900},
+    "Bucket5": {"RED": 280, "GREEN": 120, "BLUE": 0, "WHITE": 1023},
+    "Off": {"RED": 0, "GREEN": 0, "BLUE": 0, "WHITE": 0},
+}
+
+# MicroPython's tick helpers; plain-Python fallbacks so this file also runs
+# off-device with stubbed machine/umqtt modules
+try:
+    ticks_ms, ticks_us, ticks_diff, sleep_ms = time.ticks_ms, time.ticks_us, time.ticks_diff, time.sleep_ms
+except AttributeError:
+    ticks_ms = lambda: int(time.monotonic() * 1000)
+    ticks_us = lambda: int(time.monotonic() * 1000000)
+    ticks_diff = lambda a, b: a - b
+    sleep_ms = lambda ms: time.sleep(ms / 1000)
 
 # Configure the LED pins
-led_red = Pin(21, Pin.OUT)  # Red LED now on D21
-led_blue = Pin(4, Pin.OUT)  # Blue LED on D4
-led_green = Pin(5, Pin.OUT)  # Green LED on D5
-led_white = Pin(18, Pin.OUT)  # White LED on D18
+led_red = PWM(Pin(21), freq=PWM_FREQ, duty=0)  # Red LED now on D21
+led_blue = PWM(Pin(4), freq=PWM_FREQ, duty=0)  # Blue LED on D4
+led_green = PWM(Pin(5), freq=PWM_FREQ, duty=0)  # Green LED on D5
+led_white = PWM(Pin(18), freq=PWM_FREQ, duty=0)  # White LED on D18
+
+CHANNELS = {
+    "RED": led_red,
+    "BLUE": led_blue,
+    "GREEN": led_green,
+    "WHITE": led_white,
+}
+
+# Scene message keys -> channel names
+SCENE_CHANNELS = {"R": "RED", "G": "GREEN", "B": "BLUE", "W": "WHITE"}
+
+levels = {name: 0 for name in CHANNELS}  # Duty currently written to each channel
+fade = None  # (start ms, duration ms, from levels, to levels) while a fade runs
+
+def write_levels(new_levels):
+    for name, duty in new_levels.items():
+        CHANNELS[name].duty(duty)
+        levels[name] = duty
+
+def set_levels(new_levels, fade_ms=0):
+    """Go to `new_levels` now, or fade there over `fade_ms` (stepped by fade_step)."""
+    global fade
+    if fade_ms <= 0:
+        fade = None
+        write_levels(new_levels)
+    else:
+        fade = (ticks_ms(), fade_ms, dict(levels), new_levels)
+
+def fade_step():
+    """Advance the running fade; returns True while it is still running."""
+    global fade
+    if fade is None:
+        return False
+    start, duration, start_levels, end_levels = fade
+    progress = min(ticks_diff(ticks_ms(), start) / duration, 1.0)
+    write_levels({name: round(start_levels[name] + (duty - start_levels[name]) * progress)
+                  for name, duty in end_levels.items()})
+    if progress >= 1.0:
+        fade = None
+    return fade is not None
 
 # Turn all LEDs off
 def turn_off_all():
-    led_red.value(0)
-    led_blue.value(0)
-    led_green.value(0)
-    led_white.value(0)
+    set_levels(PRESETS["Off"])
+
+def _setter(name, value):
+    return lambda: set_levels({name: DUTY_MAX if value else 0})
+
+def _preset(name):
+    return lambda: set_levels(PRESETS[name], FADE_MS)
+
+# Command string -> action, e.g. "RED_ON", "WHITE_OFF", "ALL_OFF", "Bucket3"
+COMMANDS = {"ALL_OFF": turn_off_all}
+for _name in CHANNELS:
+    COMMANDS[_name + "_ON"] = _setter(_name, 1)
+    COMMANDS[_name + "_OFF"] = _setter(_name, 0)
+for _name in PRESETS:
+    COMMANDS[_name] = _preset(_name)
+
+client = None
+poll_ms = POLL_MIN_MS
+handled = 0  # Messages handled so far; the poll loop resets its back-off when this changes
+last_sid = None  # Session id of the publisher whose sequence numbers we follow
+last_seq = None
+
+def is_newer(seq, last):
+    """True if `seq` comes after `last`, allowing for the 16-bit wraparound."""
+    return last is None or 0 < (seq - last) % SEQ_MOD < SEQ_MOD // 2
+
+def scene_levels(scene):
+    """Channel name -> duty for every channel a scene message sets.
+
+    A "preset" supplies the starting levels; explicit channels override them.
+    """
+    result = dict(PRESETS[scene["preset"]]) if "preset" in scene else {}
+    for key, name in SCENE_CHANNELS.items():
+        if key in scene:
+            on, duty = scene[key]
+            result[name] = min(max(int(duty), 0), DUTY_MAX) if on else 0
+    return result
+
+def apply_scene(scene):
+    """Set every channel of a scene message at once; returns False if the scene is stale.
+
+    {"sid": 7, "seq": 42, "R": [1, 1023], "G": [0, 0], "B": [1, 512], "W": [1, 1023]}
+    {"seq": 43, "preset": "Bucket3", "fade": 1500}
+    Each channel is [on, duty]; channels left out keep their level. "fade" is
+    the transition time in ms (presets default to FADE_MS, channels to an
+    instant change). A new "sid" (publisher restart) restarts the sequence.
+    A "seq" that is not an integer raises ValueError before any state changes.
+    """
+    global last_sid, last_seq
+    # Parse everything first so a bad message changes nothing, not even the sequence
+    new_levels = scene_levels(scene)
+    fade_ms = int(scene.get("fade", FADE_MS if "preset" in scene else 0))
+    seq = scene.get("seq")
+    if "seq" in scene and (not isinstance(seq, int) or isinstance(seq, bool)):
+        raise ValueError("seq must be an integer, got %r" % (seq,))
+    if scene.get("sid") != last_sid:
+        last_sid, last_seq = scene.get("sid"), None
+    if seq is not None:
+        if not is_newer(seq, last_seq):
+            return False
+        last_seq = seq
+    set_levels(new_levels, fade_ms)
+    return True
+
+def handle_message(msg):
+    """Apply a scene (JSON) or legacy string command.
+
+    Returns the status report for it ({"command": label, ...}; scenes also echo
+    their "sid" and "seq" so the publisher can time the round trip), or None.
+    """
+    if msg[:1] == b"{":
+        try:
+            scene = json.loads(msg)
+            applied = apply_scene(scene)
+        except (ValueError, TypeError, KeyError) as e:
+            print("Bad scene message:", e)
+            return None
+        return {"command": "scene" if applied else "stale scene", "sid": scene.get("sid"), "seq": scene.get("seq")}
+
+    command = msg.decode()
+    action = COMMANDS.get(command)
+    if action is None:
+        print("Unknown command:", command)
+        return None
+    action()
+    return {"command": command}
 
 # Callback for receiving MQTT messages
 def mqtt_callback(topic, msg):
-    command = msg.decode()
-    print(f"Received message: {command}")
-
-    if command == "RED_ON":
-        led_red.value(1)  # Turn on Red LED
-    elif command == "RED_OFF":
-        led_red.value(0)  # Turn off Red LED
-    elif command == "BLUE_ON":
-        led_blue.value(1)  # Turn on Blue LED
-    elif command == "BLUE_OFF":
-        led_blue.value(0)  # Turn off Blue LED
-    elif command == "GREEN_ON":
-        led_green.value(1)  # Turn on Green LED
-    elif command == "GREEN_OFF":
-        led_green.value(0)  # Turn off Green LED
-    elif command == "WHITE_ON":
-        led_white.value(1)  # Turn on White LED
-    elif command == "WHITE_OFF":
-        led_white.value(0)  # Turn off White LED
-    elif command == "ALL_OFF":
-        turn_off_all()  # Turn off all LEDs
+    global handled
+    received = ticks_us()
+    handled += 1
+    # A malformed message must never stop the firmware; log it and keep polling
+    try:
+        status = handle_message(msg)
+    except Exception as e:
+        print("Failed to handle message:", repr(e))
+        return
+    if status is None:
+        return
+    # Time spent on the ESP32 only (parse + pin writes); the broker-to-ESP32 delay is
+    # measured by the publisher from the echoed sid/seq
+    status["apply_us"] = ticks_diff(ticks_us(), received)
+    label = "%s %s" % (status["command"], status["seq"]) if "seq" in status else status["command"]
+    print("Received message:", label, "applied in", status["apply_us"], "us")
+
+    # poll_ms bounds how long the message may have waited before check_msg picked it up
+    status["poll_ms"] = poll_ms
+    if client is not None:
+        try:
+            client.publish(STATUS_TOPIC, json.dumps(status))
+        except OSError as e:
+            print("Status publish failed:", e)
 
 # Connect to the MQTT broker
 def connect_to_mqtt():
-    client = MQTTClient("ESP32", MQTT_BROKER)
+    client = MQTTClient("ESP32", MQTT_BROKER, keepalive=KEEPALIVE)
     client.set_callback(mqtt_callback)
     client.connect()
     client.subscribe(MQTT_TOPIC)
-    print(f"Connected to MQTT broker and subscribed to {MQTT_TOPIC}")
+    client.subscribe(PRESET_TOPIC)
+    print(f"Connected to MQTT broker and subscribed to {MQTT_TOPIC} and {PRESET_TOPIC}")
     return client
 
-try:
-    client = connect_to_mqtt()
+def connect_with_retry():
+    """Connect to the broker, retrying with back-off until it answers."""
+    delay_ms = RECONNECT_MIN_MS
+    while True:
+        try:
+            return connect_to_mqtt()
+        except Exception as e:  # OSError, or umqtt's MQTTException when the broker refuses
+            print("MQTT connect failed:", e, "- retrying in", delay_ms, "ms")
+            sleep_ms(delay_ms)
+            delay_ms = min(delay_ms * 2, RECONNECT_MAX_MS)
+
+def run():
+    global client, poll_ms
+    client = connect_with_retry()
+    last_ping = ticks_ms()
     while True:
-        client.check_msg()  # Check for new messages
-        time.sleep(1)
-except KeyboardInterrupt:
-    print("Disconnecting...")
-    client.disconnect()
-    print("Disconnected from MQTT broker.")
+        try:
+            before = handled
+            client.check_msg()
+            if handled != before:
+                poll_ms = POLL_MIN_MS
+            else:
+                poll_ms = min(poll_ms * 2, POLL_MAX_MS)
+            if ticks_diff(ticks_ms(), last_ping) >= PING_EVERY_MS:
+                client.ping()
+                last_ping = ticks_ms()
+        except OSError as e:
+            print("MQTT connection lost:", e)
+            client = connect_with_retry()
+            last_ping = ticks_ms()
+            poll_ms = POLL_MIN_MS
+        # Fades run here on the ESP32, so one message drives the whole transition
+        if fade_step():
+            sleep_ms(min(poll_ms, FADE_STEP_MS))
+        else:
+            sleep_ms(poll_ms)
+
+if __name__ == "__main__":
+    try:
+        run()
+    except KeyboardInterrupt:
+        print("Disconnecting...")
+        if client is not None:
+            client.disconnect()
+        print("Disconnected from MQTT broker.")
@@ -1,3 +1,7 @@
+import json
+import time
+import queue
+import random
 import tkinter as tk
 from tkinter import messagebox
 import paho.mqtt.client as mqtt
@@ -5,10 +9,45 @@ import paho.mqtt.client as mqtt
 # MQTT broker details
 BROKER = "192.168.1.38"  # Replace with your Raspberry Pi IP
 TOPIC = "led/control"
+STATUS_TOPIC = "led/status"  # The ESP32 reports every command it applied here
+PORT = 1883
+KEEPALIVE = 60  # seconds
+
+# Automatic reconnect back-off (seconds)
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 30
+
+# Clicks within this window are sent as one scene (ms)
+BATCH_MS = 50
+
+# How often the GUI thread applies connection/delivery events from the network thread (ms)
+EVENT_POLL_MS = 50
+
+# Scenes are sent with QoS 1 so the broker acknowledges every delivery
+SCENE_QOS = 1
+
+# Send times kept for matching the ESP32's status reports (oldest dropped first)
+ROUND_TRIP_HISTORY = 64
+
+# Scene messages set every channel at once; see apply_scene in main.py
+DUTY_MAX = 1023  # Full-brightness PWM duty on the ESP32
+SEQ_MOD = 1 << 16
+SCENE_KEYS = {"RED": "R", "GREEN": "G", "BLUE": "B", "WHITE": "W"}
 
 # Initialize variables
 client = mqtt.Client()
 is_connected = False
+connection_state = "Disconnected"
+network_started = False
+pending_flush = None  # Tk after() id of the batched scene waiting to be sent
+unacked = {}  # message id -> (scene seq, time sent) until the broker acknowledges it
+last_delivery = "none"
+sent_at = {}  # scene seq -> time sent, until the ESP32 reports applying it
+last_round_trip = "none"
+events = queue.Queue()  # paho callbacks run on the network thread; Tk is only touched from the GUI thread
+session_id = random.getrandbits(16)  # Lets the ESP32 restart its sequence when this GUI restarts
+scene_seq = 0
+brightness = 100  # percent, applied to every lit channel
 
 # LED states
 led_states = {
@@ -18,21 +57,114 @@ led_states = {
     "WHITE": False,
 }
 
+def encode_scene(states, duty, seq, sid):
+    """Compact JSON scene: {"sid": .., "seq": .., "R": [on, duty], ...}."""
+    scene = {"sid": sid, "seq": seq}
+    for color, key in SCENE_KEYS.items():
+        scene[key] = [int(states[color]), duty if states[color] else 0]
+    return json.dumps(scene, separators=(",", ":"))
+
+def publish_scene():
+    """Send the current LED states as one scene message."""
+    global scene_seq, pending_flush
+    pending_flush = None
+    scene_seq = (scene_seq + 1) % SEQ_MOD
+    duty = round(DUTY_MAX * brightness / 100)
+    info = client.publish(TOPIC, encode_scene(led_states, duty, scene_seq, session_id), qos=SCENE_QOS)
+    unacked[info.mid] = (scene_seq, time.perf_counter())
+    sent_at[scene_seq] = unacked[info.mid][1]
+    if len(sent_at) > ROUND_TRIP_HISTORY:
+        sent_at.pop(next(iter(sent_at)))
+
+def schedule_scene():
+    """Send the scene after BATCH_MS, folding any further clicks in that window into it."""
+    global pending_flush
+    if pending_flush is None:
+        pending_flush = root.after(BATCH_MS, flush_scene)
+
+def flush_scene():
+    try:
+        publish_scene()
+    except Exception as e:
+        update_status(f"Failed to send message: {str(e)}")
+
+# paho callbacks (network thread): only queue the event
+def on_connect(client, userdata, flags, rc):
+    if rc == 0:
+        # (Re)subscribed on every connect, since the broker forgets subscriptions of a clean session
+        client.subscribe(STATUS_TOPIC)
+    events.put(("connect", rc))
+
+def on_disconnect(client, userdata, rc):
+    events.put(("disconnect", rc))
+
+def on_publish(client, userdata, mid):
+    events.put(("publish", mid))
+
+def on_message(client, userdata, message):
+    events.put(("status", message.payload))
+
+client.on_connect = on_connect
+client.on_disconnect = on_disconnect
+client.on_publish = on_publish
+client.on_message = on_message
+
+def process_events():
+    """Apply queued network events to the GUI state (GUI thread)."""
+    global is_connected, connection_state, last_delivery, last_round_trip
+    while True:
+        try:
+            kind, value = events.get_nowait()
+        except queue.Empty:
+            break
+        if kind == "connect":
+            is_connected = value == 0
+            connection_state = "Connected to ESP32" if is_connected else f"Connection refused: {mqtt.connack_string(value)}"
+        elif kind == "disconnect":
+            is_connected = False
+            # rc 0 is a disconnect we asked for; anything else is retried by the network loop
+            connection_state = "Disconnected" if value == 0 else "Connection lost, reconnecting..."
+        elif kind == "publish" and value in unacked:
+            seq, sent = unacked.pop(value)
+            last_delivery = f"scene {seq} in {(time.perf_counter() - sent) * 1000:.0f} ms"
+        elif kind == "status":
+            try:
+                status = json.loads(value)
+            except ValueError:
+                continue
+            # Only scenes from this session: publish -> broker -> ESP32 applies -> status back
+            if status.get("sid") == session_id and status.get("seq") in sent_at:
+                seq = status["seq"]
+                round_trip = (time.perf_counter() - sent_at.pop(seq)) * 1000
+                last_round_trip = (f"{status['command']} {seq} in {round_trip:.0f} ms "
+                                   f"(ESP32 {status.get('apply_us', 0)} us)")
+    root.after(EVENT_POLL_MS, process_events)
+
 # Functions for MQTT communication
 def connect_esp32():
-    global is_connected
+    global network_started, connection_state
+    if network_started:
+        update_status(connection_state)
+        return
     try:
-        client.connect(BROKER)
-        is_connected = True
-        update_status("Connected to ESP32")
+        # Connects and reconnects on paho's network thread, so an unreachable broker never blocks the GUI
+        client.reconnect_delay_set(RECONNECT_MIN_DELAY, RECONNECT_MAX_DELAY)
+        client.connect_async(BROKER, PORT, KEEPALIVE)
+        client.loop_start()
+        network_started = True
+        connection_state = f"Connecting to {BROKER}..."
+        update_status(connection_state)
     except Exception as e:
         update_status(f"Failed to connect: {str(e)}")
 
 def disconnect_esp32():
-    global is_connected
+    global is_connected, network_started, connection_state
     try:
         client.disconnect()
+        client.loop_stop()
         is_connected = False
+        network_started = False
+        connection_state = "Disconnected"
         update_status("Disconnected from ESP32")
     except Exception as e:
         update_status(f"Failed to disconnect: {str(e)}")
@@ -42,35 +174,35 @@ def toggle_led(color):
         messagebox.showwarning("Warning", "ESP32 is not connected!")
         return
 
-    try:
-        # Determine ON or OFF command
-        if led_states[color]:
-            client.publish(TOPIC, f"{color}_OFF")
-            led_states[color] = False
-            update_status(f"Turned {color} OFF")
-        else:
-            client.publish(TOPIC, f"{color}_ON")
-            led_states[color] = True
-            update_status(f"Turned {color} ON")
-    except Exception as e:
-        update_status(f"Failed to send message: {str(e)}")
+    # Flip the channel and send the whole scene, so every channel changes together
+    led_states[color] = not led_states[color]
+    schedule_scene()
+    update_status(f"Turned {color} {'ON' if led_states[color] else 'OFF'}")
+
+def set_brightness(value):
+    global brightness
+    brightness = int(float(value))
+    if not is_connected:
+        return
+    # Dragging the slider produces a burst of values; only the latest is sent
+    schedule_scene()
+    update_status(f"Brightness {brightness}%")
 
 # Update GUI status
 def update_status(message):
     status_label.config(text=f"Status: {message}")
 
-# Real-time status monitoring
+# Real-time status monitoring, driven by the broker's connection and delivery callbacks
 def check_connection():
-    if is_connected:
-        status_label.config(text="Status: Connected to ESP32")
-    else:
-        status_label.config(text="Status: Disconnected")
+    status_label.config(text=f"Status: {connection_state}")
+    delivery_label.config(text=f"Last delivered: {last_delivery}, awaiting ack: {len(unacked)}\n"
+                               f"Last applied: {last_round_trip}")
     # Call this function again after 1 second
     root.after(1000, check_connection)
 
 # GUI setup
 def setup_gui():
-    global root, status_label
+    global root, status_label, delivery_label
     root = tk.Tk()
     root.title("LED Debugger GUI")
 
@@ -78,6 +210,9 @@ def setup_gui():
     status_label = tk.Label(root, text="Status: Disconnected", font=("Arial", 12))
     status_label.pack(pady=10)
 
+    delivery_label = tk.Label(root, text="Last delivered: none", font=("Arial", 10))
+    delivery_label.pack()
+
     # Buttons for connecting and disconnecting
     connect_button = tk.Button(root, text="Connect to ESP32", font=("Arial", 12), command=connect_esp32)
     connect_button.pack(pady=5)
@@ -98,7 +233,14 @@ def setup_gui():
     white_button = tk.Button(root, text="Toggle White (D18)", font=("Arial", 12), command=lambda: toggle_led("WHITE"))
     white_button.pack(pady=5)
 
+    # PWM brightness of every lit channel
+    brightness_scale = tk.Scale(root, from_=0, to=100, orient=tk.HORIZONTAL, label="Brightness (%)",
+                                font=("Arial", 12), command=set_brightness)
+    brightness_scale.set(brightness)
+    brightness_scale.pack(pady=5)
+
     # Start real-time status monitoring
+    process_events()
     check_connection()
 
     # Run the GUI